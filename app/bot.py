@@ -1,11 +1,15 @@
 import math
-from aiogram import Bot, Dispatcher
-from aiogram.filters import Command
-from aiogram.types import Message, MessageReactionUpdated
+import time
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import Command, Filter
+from aiogram.types import Message, MessageReactionUpdated, Update
 
 from .config import Config
-from .db import DB
-from .solana import SOL_ADDR_RE, get_token_balance_raw, get_token_decimals, get_price_usd_dexscreener
+from .contests import Contest, Contests
+from .metrics import HANDLER_SECONDS, SCORED
+from .outbox import Outbox
+from .ratelimit import Cooldown
+from .solana import SOL_ADDR_RE, SolanaClient
 
 
 def is_admin(cfg: Config, user_id: int) -> bool:
@@ -30,21 +34,229 @@ def is_meme_media(m: Message) -> bool:
 LIKE_EMOJIS = {"👍", "❤️", "🔥"}
 
 
-def build_dispatcher(bot: Bot, cfg: Config, database: DB) -> Dispatcher:
+def has_like(reactions) -> bool:
+    """True if the NEW reaction list includes a like emoji."""
+    return any(getattr(r, "emoji", None) in LIKE_EMOJIS for r in reactions or ())
+
+
+# Scoring filters. These are Filter subclasses (async __call__) on purpose:
+# aiogram runs plain callables and F magic filters through run_in_executor,
+# which costs a thread hop per check on every group message.
+
+class IsCommand(Filter):
+    """Text or caption starts with "/": the only messages a Command filter can match."""
+
+    async def __call__(self, m: Message) -> bool:
+        text = m.text or m.caption
+        return bool(text) and text.startswith("/")
+
+
+class InContest(Filter):
+    """Update from a contest group with a known sender (from_user / user); passes `contest`."""
+
+    def __init__(self, contests: Contests):
+        self.contests = contests
+
+    async def __call__(self, event):
+        sender = event.from_user if isinstance(event, Message) else event.user
+        contest = self.contests.for_chat(event.chat.id)
+        if contest is None or sender is None:
+            return False
+        return {"contest": contest}
+
+
+class ContestScope(Filter):
+    """
+    The contest a command is about, passed as `contest`: the group's own one
+    in a contest group, elsewhere the sender's /contest pick, or the only
+    contest when there is just one.
+    """
+
+    def __init__(self, contests: Contests, picks: dict):
+        self.contests = contests
+        self.picks = picks  # tg_id -> contest name
+
+    async def __call__(self, m: Message):
+        contest = self.contests.for_chat(m.chat.id)
+        if contest is None and m.from_user:
+            name = self.picks.get(m.from_user.id)
+            contest = self.contests.by_name.get(name) if name else self.contests.only()
+        if contest is None:
+            return False
+        return {"contest": contest}
+
+
+def render_cached(cache: dict, name: str, rows, render) -> str:
+    """
+    Re-render a ranking message only when its rows changed since the last call.
+    """
+    key = tuple((r["tg_id"], r["username"], int(r["points"])) for r in rows)
+    hit = cache.get(name)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    text = render(rows)
+    cache[name] = (key, text)
+    return text
+
+
+def render_leaderboard(rows) -> str:
+    lines = ["🏆 *Top 10 Leaderboard*"]
+    for i, r in enumerate(rows, start=1):
+        name = r["username"] or f"user_{r['tg_id']}"
+        lines.append(f"{i}. @{name} — *{int(r['points'])}* pts")
+    return "\n".join(lines)
+
+
+def render_winners(rows) -> str:
+    medals = ["🥇", "🥈", "🥉"]
+    lines = ["🏆 *Top 3 (current)*"]
+    for i, r in enumerate(rows):
+        name = r["username"] or f"user_{r['tg_id']}"
+        lines.append(f"{medals[i]} @{name} — *{int(r['points'])}* pts")
+    return "\n".join(lines)
+
+
+async def meme_reply_points(m: Message, contest: Contest):
+    database = contest.db
+    if not await database.contest_is_live():
+        return
+
+    parent_id = m.reply_to_message.message_id
+    owner_id = await database.get_meme_owner(m.chat.id, parent_id)
+    if owner_id is None:
+        return  # not a reply to a tracked meme
+
+    # Only score once per reply message
+    if not await database.mark_reply_scored(m.chat.id, m.message_id):
+        return
+
+    # Owner must still be verified + joined to earn
+    if not await database.is_eligible(owner_id):
+        return
+
+    await database.add_points(owner_id, 1)
+    SCORED.inc(contest.name, "reply")
+
+
+async def meme_post_points(m: Message, contest: Contest):
+    database = contest.db
+    if not await database.contest_is_live():
+        return
+    if not await database.is_eligible(m.from_user.id):
+        return
+
+    inserted = await database.insert_meme(m.chat.id, m.message_id, m.from_user.id)
+    if inserted:
+        await database.add_points(m.from_user.id, 1)
+        SCORED.inc(contest.name, "post")
+
+
+async def meme_like_points(event: MessageReactionUpdated, contest: Contest):
+    database = contest.db
+    if not await database.contest_is_live():
+        return
+
+    meme_id = event.message_id
+    reactor_id = event.user.id
+
+    owner_id = await database.get_meme_owner(event.chat.id, meme_id)
+    if owner_id is None:
+        return  # only reactions on tracked memes count
+
+    # 1 point per reacting user per meme (anti toggle farm)
+    if not await database.mark_reaction_scored(event.chat.id, meme_id, reactor_id):
+        return
+
+    if not await database.is_eligible(owner_id):
+        return
+
+    await database.add_points(owner_id, 1)
+    SCORED.inc(contest.name, "reaction")
+
+
+def register_scoring(dp: Dispatcher, contests: Contests):
+    """
+    Group scoring for every contest group: one message and one reaction
+    handler on dp itself, ahead of every router (each Router is another
+    propagation pass per update, even without a handler for it). InContest
+    classifies an update once (one dict lookup by chat id) and rejects other
+    chats and updates without a sender; the handler then picks the single
+    path, reply or meme post, and reactions only score if they add a like.
+    Everything else from a contest group stops here instead of reaching the
+    command filters. Each contest scores into its own shard.
+    """
+    in_group = InContest(contests)
+
+    # commands (even as a media caption) go on to the commands router
+    @dp.message(in_group, ~IsCommand())
+    async def group_message(m: Message, contest: Contest):
+        # Only score "posts" (not replies): a reply is scored for its meme
+        if m.reply_to_message is not None:
+            await meme_reply_points(m, contest)
+        elif is_meme_media(m):
+            await meme_post_points(m, contest)
+
+    @dp.message_reaction(in_group)
+    async def group_reaction(event: MessageReactionUpdated, contest: Contest):
+        if has_like(event.new_reaction):
+            await meme_like_points(event, contest)
+
+
+def build_dispatcher(bot: Bot, cfg: Config, contests: Contests, rpc: SolanaClient, outbox: Outbox) -> Dispatcher:
     dp = Dispatcher()
+    commands = Router(name="commands")
+    commands.message.filter(IsCommand())
+
+    async def answer(m: Message, text: str, **kwargs):
+        # command replies go through the outbox ahead of queued notices
+        return await outbox.reply(m.chat.id, text, **kwargs)
+
+    verify_cooldown = Cooldown(cfg.verify_cooldown_seconds)
+    picks = {}  # tg_id -> contest name picked with /contest (for private chats)
+    scoped = ContestScope(contests, picks)
+
+    def contest_list() -> str:
+        lines = ["🏁 *Contests*\n"]
+        for c in contests:
+            lines.append(f"• `{c.name}` — CA `{c.spec.token_mint}`, min hold **${c.spec.min_hold_usd:.2f}**")
+        lines.append("\nPick one: `/contest NAME`")
+        return "\n".join(lines)
+
+    @dp.update.outer_middleware()
+    async def time_update(handler, event: Update, data):
+        t = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - t, event.event_type)
+
+    @commands.message(Command("contests"))
+    async def list_contests(m: Message):
+        await answer(m, contest_list(), parse_mode="Markdown")
 
-    @dp.message(Command("start"))
-    async def start(m: Message):
-        database.ensure_user(m.from_user.id, m.from_user.username or "")
-        active, start_ts, end_ts = database.contest_status()
-        live = database.contest_is_live()
+    @commands.message(Command("contest"))
+    async def pick_contest(m: Message):
+        parts = m.text.split()
+        name = parts[1].lower() if len(parts) == 2 else ""
+        if name not in contests.by_name:
+            return await answer(m, contest_list(), parse_mode="Markdown")
+        picks[m.from_user.id] = name
+        await answer(m, f"✅ Commands now apply to `{name}`. Use `/start` for its rules.", parse_mode="Markdown")
+
+    @commands.message(Command("start"), scoped)
+    async def start(m: Message, contest: Contest):
+        database, spec = contest.db, contest.spec
+        await database.ensure_user(m.from_user.id, m.from_user.username or "")
+        active, start_ts, end_ts = await database.contest_status()
+        live = await database.contest_is_live()
 
         status = "LIVE ✅" if live else ("Active (not in window) ⚠️" if active else "Not started ❌")
 
+        title = f"🏁 *Meme Contest Bot* — `{contest.name}`" if len(contests) > 1 else "🏁 *Meme Contest Bot*"
         text = (
-            "🏁 *Meme Contest Bot*\n\n"
-            f"Token mint (CA): `{cfg.token_mint}`\n"
-            f"Min hold: **${cfg.min_hold_usd:.2f}**\n\n"
+            f"{title}\n\n"
+            f"Token mint (CA): `{spec.token_mint}`\n"
+            f"Min hold: **${spec.min_hold_usd:.2f}**\n\n"
             "✅ To participate you must be a holder.\n"
             "1) Verify: `/verify YOUR_SOL_WALLET`\n"
             "2) Join: `/join`\n"
@@ -54,259 +266,198 @@ def build_dispatcher(bot: Bot, cfg: Config, database: DB) -> Dispatcher:
         if end_ts:
             text += f"Ends: <t:{end_ts}:F>\n"
 
-        if cfg.contest_group_id != 0:
-            text += f"\nScoring Group ID: `{cfg.contest_group_id}`\n"
+        if spec.group_id != 0:
+            text += f"\nScoring Group ID: `{spec.group_id}`\n"
+        if len(contests) > 1:
+            text += "\nOther contests: `/contests`\n"
 
-        await m.answer(text, parse_mode="Markdown")
+        await answer(m, text, parse_mode="Markdown")
 
-    @dp.message(Command("status"))
-    async def status(m: Message):
-        database.ensure_user(m.from_user.id, m.from_user.username or "")
-        active, start_ts, end_ts = database.contest_status()
-        live = database.contest_is_live()
-        await m.answer(
-            f"Active: {active}\nLive: {live}\nStart: {start_ts}\nEnd: {end_ts}\nGroup: {cfg.contest_group_id}"
-        )
+    @commands.message(Command("status"), scoped)
+    async def status(m: Message, contest: Contest):
+        database, spec = contest.db, contest.spec
+        await database.ensure_user(m.from_user.id, m.from_user.username or "")
+        active, start_ts, end_ts = await database.contest_status()
+        live = await database.contest_is_live()
+        await answer(m, f"Active: {active}\nLive: {live}\nStart: {start_ts}\nEnd: {end_ts}\nGroup: {spec.group_id}")
 
-    @dp.message(Command("verify"))
-    async def verify(m: Message):
-        database.ensure_user(m.from_user.id, m.from_user.username or "")
+    @commands.message(Command("verify"), scoped)
+    async def verify(m: Message, contest: Contest):
+        database, spec = contest.db, contest.spec
+        await database.ensure_user(m.from_user.id, m.from_user.username or "")
 
         parts = m.text.split()
         if len(parts) != 2:
-            return await m.answer("Usage: `/verify YOUR_SOL_WALLET`", parse_mode="Markdown")
+            return await answer(m, "Usage: `/verify YOUR_SOL_WALLET`", parse_mode="Markdown")
 
         wallet = parts[1].strip()
         if not SOL_ADDR_RE.match(wallet):
-            return await m.answer("That doesn’t look like a valid Solana wallet address.")
+            return await answer(m, "That doesn’t look like a valid Solana wallet address.")
+
+        wait = verify_cooldown.remaining(m.from_user.id)
+        if wait:
+            return await answer(m, f"Please wait {math.ceil(wait)}s before using /verify again.")
 
-        # balance
+        # balance (concurrent lookups of the same wallet share one RPC call),
+        # decimals and price (cached); any of them raises when the RPC or
+        # Dexscreener is overloaded or unreachable
         try:
-            bal_raw = await get_token_balance_raw(cfg.sol_rpc_url, wallet, cfg.token_mint)
+            bal_raw = await rpc.token_balance_raw(wallet, spec.token_mint)
+            decimals = await rpc.token_decimals(spec.token_mint)
+            price_usd = await rpc.price_usd(spec.token_mint)
         except Exception as e:
-            return await m.answer(f"RPC error verifying wallet. Try again later.\n\n`{e}`", parse_mode="Markdown")
+            print(f"[VERIFY {contest.name}] RPC error wallet={wallet}: {e}")
+            return await answer(m, "⏳ The RPC is busy right now, couldn’t check your wallet. Try again shortly.")
 
-        # decimals
-        decimals = await get_token_decimals(cfg.sol_rpc_url, cfg.token_mint)
         if decimals is None:
-            return await m.answer("Couldn’t fetch token decimals right now. Try again shortly.")
-
-        # price
-        price_usd = await get_price_usd_dexscreener(cfg.token_mint)
+            return await answer(m, "Couldn’t fetch token decimals right now. Try again shortly.")
         if not price_usd or price_usd <= 0:
-            return await m.answer("Couldn’t fetch token price right now (Dexscreener). Try again shortly.")
+            return await answer(m, "Couldn’t fetch token price right now (Dexscreener). Try again shortly.")
 
         # threshold
-        min_tokens = cfg.min_hold_usd / price_usd
+        min_tokens = spec.min_hold_usd / price_usd
         min_raw = math.ceil(min_tokens * (10 ** decimals))
+        # only a completed check costs a cooldown; RPC failures can be retried right away
+        verify_cooldown.start(m.from_user.id)
 
         if bal_raw < min_raw:
             ui_bal = bal_raw / (10 ** decimals)
             ui_min = min_raw / (10 ** decimals)
-            database.set_verified(m.from_user.id, wallet, 0)
-            return await m.answer(
+            await database.set_verified(m.from_user.id, wallet, 0)
+            return await answer(
+                m,
                 f"❌ Not enough holdings.\n\n"
-                f"Minimum: **${cfg.min_hold_usd:.2f}** (≈ **{ui_min:.6f}** tokens)\n"
+                f"Minimum: **${spec.min_hold_usd:.2f}** (≈ **{ui_min:.6f}** tokens)\n"
                 f"You have: **{ui_bal:.6f}** tokens\n\n"
                 f"Buy a little more and run `/verify {wallet}` again.",
                 parse_mode="Markdown",
             )
 
-        database.set_verified(m.from_user.id, wallet, 1)
-        await m.answer("✅ Verified holder (≥ $5). Now use `/join` to enter the contest.", parse_mode="Markdown")
+        await database.set_verified(m.from_user.id, wallet, 1)
+        await answer(m, f"✅ Verified holder (≥ ${spec.min_hold_usd:.2f}). Now use `/join` to enter the contest.", parse_mode="Markdown")
 
-    @dp.message(Command("join"))
-    async def join(m: Message):
-        database.ensure_user(m.from_user.id, m.from_user.username or "")
+    @commands.message(Command("join"), scoped)
+    async def join(m: Message, contest: Contest):
+        database = contest.db
+        await database.ensure_user(m.from_user.id, m.from_user.username or "")
 
-        if not database.contest_is_live():
-            return await m.answer("Contest isn’t live right now.")
+        if not await database.contest_is_live():
+            return await answer(m, "Contest isn’t live right now.")
 
-        u = database.get_user(m.from_user.id)
+        u = await database.get_user(m.from_user.id)
         if not u or int(u["verified"]) != 1:
-            return await m.answer("You must verify as a holder first: `/verify YOUR_SOL_WALLET`", parse_mode="Markdown")
+            return await answer(m, "You must verify as a holder first: `/verify YOUR_SOL_WALLET`", parse_mode="Markdown")
 
-        database.mark_joined(m.from_user.id)
-        await m.answer("🏁 You’re in! Post memes in the contest group to earn points.", parse_mode="Markdown")
+        await database.mark_joined(m.from_user.id)
+        await answer(m, "🏁 You’re in! Post memes in the contest group to earn points.", parse_mode="Markdown")
 
-    @dp.message(Command("leaderboard"))
-    async def leaderboard(m: Message):
-        rows = database.top_leaderboard(10)
+    @commands.message(Command("leaderboard"), scoped)
+    async def leaderboard(m: Message, contest: Contest):
+        database = contest.db
+        rows = await database.top_leaderboard(10)
         if not rows:
-            return await m.answer("No entries yet. Be the first to `/join`.")
+            return await answer(m, "No entries yet. Be the first to `/join`.")
 
-        lines = ["🏆 *Top 10 Leaderboard*"]
-        for i, r in enumerate(rows, start=1):
-            name = r["username"] or f"user_{r['tg_id']}"
-            lines.append(f"{i}. @{name} — *{int(r['points'])}* pts")
-        await m.answer("\n".join(lines), parse_mode="Markdown")
+        text = render_cached(contest.rendered, "leaderboard", rows, render_leaderboard)
+        await answer(m, text, parse_mode="Markdown")
 
-    @dp.message(Command("myrank"))
-    async def myrank(m: Message):
-        rank = database.get_rank(m.from_user.id)
+    @commands.message(Command("myrank"), scoped)
+    async def myrank(m: Message, contest: Contest):
+        database = contest.db
+        rank = await database.get_rank(m.from_user.id)
         if not rank:
-            return await m.answer("You’re not ranked yet. Verify + `/join` first.")
+            return await answer(m, "You’re not ranked yet. Verify + `/join` first.")
         pos, pts = rank
-        await m.answer(f"📍 Your rank: *#{pos}* with *{pts}* points.", parse_mode="Markdown")
+        await answer(m, f"📍 Your rank: *#{pos}* with *{pts}* points.", parse_mode="Markdown")
 
     # -------- Admin Commands --------
 
-    @dp.message(Command("setcontest"))
-    async def setcontest(m: Message):
+    @commands.message(Command("setcontest"), scoped)
+    async def setcontest(m: Message, contest: Contest):
+        database = contest.db
         if not is_admin(cfg, m.from_user.id):
-            return await m.answer("Admin only.")
+            return await answer(m, "Admin only.")
         parts = m.text.split()
         if len(parts) != 2 or not parts[1].isdigit():
-            return await m.answer("Usage: `/setcontest 14` (days)", parse_mode="Markdown")
+            return await answer(m, "Usage: `/setcontest 14` (days)", parse_mode="Markdown")
         days = int(parts[1])
-        database.set_contest_days(days)
-        _, _, end_ts = database.contest_status()
-        await m.answer(f"✅ Contest started for {days} days.\nEnds: <t:{end_ts}:F>")
+        await database.set_contest_days(days)
+        _, _, end_ts = await database.contest_status()
+        await answer(m, f"✅ Contest started for {days} days.\nEnds: <t:{end_ts}:F>")
 
-    @dp.message(Command("endcontest"))
-    async def endcontest(m: Message):
+    @commands.message(Command("endcontest"), scoped)
+    async def endcontest(m: Message, contest: Contest):
+        database = contest.db
         if not is_admin(cfg, m.from_user.id):
-            return await m.answer("Admin only.")
-        database.end_contest()
-        await m.answer("⛔ Contest ended.")
+            return await answer(m, "Admin only.")
+        await database.end_contest()
+        await answer(m, "⛔ Contest ended.")
 
-    @dp.message(Command("addpoints"))
-    async def addpoints(m: Message):
+    @commands.message(Command("addpoints"), scoped)
+    async def addpoints(m: Message, contest: Contest):
+        database = contest.db
         if not is_admin(cfg, m.from_user.id):
-            return await m.answer("Admin only.")
+            return await answer(m, "Admin only.")
 
         parts = m.text.split(maxsplit=3)
         if len(parts) < 3:
-            return await m.answer("Usage: `/addpoints @username 10 optional_reason`", parse_mode="Markdown")
+            return await answer(m, "Usage: `/addpoints @username 10 optional_reason`", parse_mode="Markdown")
 
         username = parts[1].lstrip("@")
         delta = int(parts[2])
 
-        tg_id = database.find_user_by_username(username)
+        tg_id = await database.find_user_by_username(username)
         if not tg_id:
-            return await m.answer("User not found (they must /start the bot first).")
+            return await answer(m, "User not found (they must /start the bot first).")
 
-        database.add_points(tg_id, delta)
-        await m.answer(f"✅ Added {delta} points to @{username}.")
+        await database.add_points(tg_id, delta)
+        await answer(m, f"✅ Added {delta} points to @{username}.")
 
-    @dp.message(Command("removepoints"))
-    async def removepoints(m: Message):
+    @commands.message(Command("removepoints"), scoped)
+    async def removepoints(m: Message, contest: Contest):
+        database = contest.db
         if not is_admin(cfg, m.from_user.id):
-            return await m.answer("Admin only.")
+            return await answer(m, "Admin only.")
 
         parts = m.text.split(maxsplit=3)
         if len(parts) < 3:
-            return await m.answer("Usage: `/removepoints @username 5 optional_reason`", parse_mode="Markdown")
+            return await answer(m, "Usage: `/removepoints @username 5 optional_reason`", parse_mode="Markdown")
 
         username = parts[1].lstrip("@")
         delta = int(parts[2])
 
-        tg_id = database.find_user_by_username(username)
+        tg_id = await database.find_user_by_username(username)
         if not tg_id:
-            return await m.answer("User not found (they must /start the bot first).")
+            return await answer(m, "User not found (they must /start the bot first).")
 
-        database.add_points(tg_id, -abs(delta))
-        await m.answer(f"✅ Removed {abs(delta)} points from @{username}.")
+        await database.add_points(tg_id, -abs(delta))
+        await answer(m, f"✅ Removed {abs(delta)} points from @{username}.")
 
-    @dp.message(Command("winners"))
-    async def winners(m: Message):
-        rows = database.top_n(3)
+    @commands.message(Command("winners"), scoped)
+    async def winners(m: Message, contest: Contest):
+        database = contest.db
+        rows = await database.top_n(3)
         if not rows:
-            return await m.answer("No entries yet.")
-        medals = ["🥇", "🥈", "🥉"]
-        lines = ["🏆 *Top 3 (current)*"]
-        for i, r in enumerate(rows):
-            name = r["username"] or f"user_{r['tg_id']}"
-            lines.append(f"{medals[i]} @{name} — *{int(r['points'])}* pts")
-        await m.answer("\n".join(lines), parse_mode="Markdown")
+            return await answer(m, "No entries yet.")
+        text = render_cached(contest.rendered, "winners", rows, render_winners)
+        await answer(m, text, parse_mode="Markdown")
+
+    # scoped commands when no contest applies (several contests, none picked)
+    @commands.message(Command(
+        "start", "status", "verify", "join", "leaderboard", "myrank",
+        "setcontest", "endcontest", "addpoints", "removepoints", "winners",
+    ))
+    async def needs_contest(m: Message):
+        await answer(m, contest_list(), parse_mode="Markdown")
 
     # -------- Auto Scoring (Group) --------
     # Rules:
     # +1 for posting meme media (NOT as a reply)
     # +1 to meme owner for each reply on that meme (replier gets 0)
     # +1 to meme owner for each "like" reaction (unique user per meme) (liker gets 0)
-
-    @dp.message()
-    async def meme_post_points(m: Message):
-        if cfg.contest_group_id == 0 or m.chat.id != cfg.contest_group_id:
-            return
-        if not m.from_user:
-            return
-        if not database.contest_is_live():
-            return
-
-        # Only score "posts" (not replies)
-        if m.reply_to_message is not None:
-            return
-
-        u = database.get_user(m.from_user.id)
-        if not u or int(u["verified"]) != 1 or u["joined_at"] is None:
-            return
-
-        if not is_meme_media(m):
-            return
-
-        inserted = database.insert_meme(m.chat.id, m.message_id, m.from_user.id)
-        if inserted:
-            database.add_points(m.from_user.id, 1)
-
-    @dp.message()
-    async def meme_reply_points(m: Message):
-        if cfg.contest_group_id == 0 or m.chat.id != cfg.contest_group_id:
-            return
-        if not m.from_user or not m.reply_to_message:
-            return
-        if not database.contest_is_live():
-            return
-
-        parent_id = m.reply_to_message.message_id
-        owner_id = database.get_meme_owner(m.chat.id, parent_id)
-        if owner_id is None:
-            return  # not a reply to a tracked meme
-
-        # Only score once per reply message
-        if not database.mark_reply_scored(m.chat.id, m.message_id):
-            return
-
-        # Owner must still be verified + joined to earn
-        owner = database.get_user(owner_id)
-        if not owner or int(owner["verified"]) != 1 or owner["joined_at"] is None:
-            return
-
-        database.add_points(owner_id, 1)
-
-    @dp.message_reaction()
-    async def meme_like_points(event: MessageReactionUpdated):
-        if cfg.contest_group_id == 0 or event.chat.id != cfg.contest_group_id:
-            return
-        if not database.contest_is_live():
-            return
-
-        meme_id = event.message_id
-        reactor_id = event.user.id
-
-        owner_id = database.get_meme_owner(event.chat.id, meme_id)
-        if owner_id is None:
-            return  # only reactions on tracked memes count
-
-        # Only count if NEW reaction includes a like emoji
-        new_emojis = set()
-        for r in (event.new_reaction or []):
-            emoji = getattr(r, "emoji", None)
-            if emoji:
-                new_emojis.add(emoji)
-
-        if not (new_emojis & LIKE_EMOJIS):
-            return
-
-        # 1 point per reacting user per meme (anti toggle farm)
-        if not database.mark_reaction_scored(event.chat.id, meme_id, reactor_id):
-            return
-
-        owner = database.get_user(owner_id)
-        if not owner or int(owner["verified"]) != 1 or owner["joined_at"] is None:
-            return
-
-        database.add_points(owner_id, 1)
+    if contests.by_chat:
+        register_scoring(dp, contests)
+    # IsCommand lets any other non-command message skip the Command filters
+    dp.include_router(commands)
 
     return dp
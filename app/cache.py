@@ -0,0 +1,63 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class AsyncTTLCache:
+    """
+    Async cache with per-entry TTL, an LRU size bound and single-flight loading:
+    concurrent get()s for the same missing key share one loader call.
+
+    ttl=None caches forever. A loader that raises or returns None is a failed
+    refresh: if serve_stale is set and an old value exists, that value is
+    returned instead; otherwise the error (or None) is passed through and
+    nothing is cached.
+    """
+
+    def __init__(self, ttl: Optional[float], maxsize: int = 1024, serve_stale: bool = True):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.serve_stale = serve_stale
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (stored_at, value)
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _fresh(self, entry: tuple) -> bool:
+        return self.ttl is None or time.monotonic() - entry[0] < self.ttl
+
+    def _store(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._data.get(key)
+        if entry is not None and self._fresh(entry):
+            self._data.move_to_end(key)
+            return entry[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: one impatient caller being cancelled must not cancel the shared load
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+        except Exception:
+            stale = self._data.get(key)
+            if self.serve_stale and stale is not None:
+                return stale[1]
+            raise
+        if value is None:
+            stale = self._data.get(key)
+            return stale[1] if self.serve_stale and stale is not None else None
+        self._store(key, value)
+        return value
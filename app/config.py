@@ -1,5 +1,20 @@
 import os
+import re
 from dataclasses import dataclass
+from typing import Tuple
+
+CONTEST_NAME_RE = re.compile(r"^[a-z0-9_-]{1,32}$")
+
+
+@dataclass(frozen=True)
+class ContestSpec:
+    """One contest community: its scoring group, token and threshold, and its own sqlite shard."""
+    name: str
+    group_id: int
+    token_mint: str
+    min_hold_usd: float
+    db_path: str
+    archive_db_path: str
 
 
 @dataclass(frozen=True)
@@ -8,17 +23,52 @@ class Config:
     admin_ids: set[int]
 
     sol_rpc_url: str
-    token_mint: str
-    min_hold_usd: float
+    sol_ws_url: str
+    rpc_limit_per_host: int
+    rpc_timeout_seconds: float
+    dns_cache_seconds: int
+    rpc_batch_size: int
+    rpc_balance_encoding: str  # "jsonParsed" or "base64" (amount-only dataSlice)
+    price_ttl_seconds: float
+    balance_ttl_seconds: float
+    verify_cooldown_seconds: float
+    outbox_global_rps: float
+    outbox_workers: int
 
     contest_days_default: int
     sweep_every_seconds: int
+    sweep_mode: str  # "wallet" (per-wallet batches) or "snapshot" (getProgramAccounts)
+    sweep_schedule: str  # "continuous" (prioritized, wallet mode only) or "cycle"
+    sweep_tick_seconds: int
+    reprioritize_price_move: float
+    sweep_max_rps: float
+    sweep_concurrency: int
     kick_on_fail: bool
 
-    db_path: str
+    # real-time holder tracking over the RPC websocket (see app/holders.py);
+    # when on, the periodic sweep runs every reconcile_every_seconds instead
+    holder_ws_enabled: bool
+    reconcile_every_seconds: int
 
-    # NEW: group where scoring happens
-    contest_group_id: int
+    db_readers: int
+    flush_interval_ms: int
+    flush_max_events: int
+    dedup_capacity: int
+
+    # every contest this process serves: scoring group, mint, threshold and
+    # shard paths live on the ContestSpec, everything above is shared
+    contests: Tuple[ContestSpec, ...]
+
+    update_mode: str  # "polling" or "webhook"
+    webhook_url: str  # public base URL Telegram posts to
+    webhook_path: str
+    webhook_secret: str
+    webhook_host: str
+    webhook_port: int
+    webhook_max_concurrency: int
+
+    metrics_host: str
+    metrics_port: int  # 0 disables the /metrics endpoint
 
 
 def load_config() -> Config:
@@ -36,29 +86,143 @@ def load_config() -> Config:
     sol_rpc_url = os.getenv("SOL_RPC_URL", "").strip()
     if not sol_rpc_url:
         raise RuntimeError("SOL_RPC_URL is required")
+    default_ws_url = "ws" + sol_rpc_url[len("http"):] if sol_rpc_url.startswith("http") else sol_rpc_url
+    sol_ws_url = os.getenv("SOL_WS_URL", "").strip() or default_ws_url
+    # numbers left blank (as .env.example ships some) fall back to their defaults
+    rpc_limit_per_host = int(os.getenv("RPC_LIMIT_PER_HOST") or "20")
+    rpc_timeout_seconds = float(os.getenv("RPC_TIMEOUT_SECONDS") or "20")
+    dns_cache_seconds = int(os.getenv("DNS_CACHE_SECONDS") or "300")
+    rpc_batch_size = max(1, int(os.getenv("RPC_BATCH_SIZE") or "50"))
+    rpc_balance_encoding = os.getenv("RPC_BALANCE_ENCODING", "jsonParsed").strip()
+    if rpc_balance_encoding not in ("jsonParsed", "base64"):
+        raise RuntimeError("RPC_BALANCE_ENCODING must be 'jsonParsed' or 'base64'")
+    price_ttl_seconds = float(os.getenv("PRICE_TTL_SECONDS") or "60")
+    balance_ttl_seconds = float(os.getenv("BALANCE_TTL_SECONDS") or "5")
+    verify_cooldown_seconds = float(os.getenv("VERIFY_COOLDOWN_SECONDS") or "10")
+    outbox_global_rps = float(os.getenv("OUTBOX_GLOBAL_RPS") or "25")
+    outbox_workers = int(os.getenv("OUTBOX_WORKERS") or "4")
 
     token_mint = os.getenv("TOKEN_MINT", "").strip()
-    if not token_mint:
-        raise RuntimeError("TOKEN_MINT is required")
-
-    min_hold_usd = float(os.getenv("MIN_HOLD_USD", "5"))
-    contest_days_default = int(os.getenv("CONTEST_DAYS_DEFAULT", "14"))
-    sweep_every_seconds = int(os.getenv("SWEEP_EVERY_SECONDS", str(6 * 60 * 60)))
+    min_hold_usd = float(os.getenv("MIN_HOLD_USD") or "5")
+    contest_days_default = int(os.getenv("CONTEST_DAYS_DEFAULT") or "14")
+    sweep_every_seconds = int(os.getenv("SWEEP_EVERY_SECONDS") or str(6 * 60 * 60))
+    sweep_mode = os.getenv("SWEEP_MODE", "wallet").strip().lower()
+    if sweep_mode not in ("wallet", "snapshot"):
+        raise RuntimeError("SWEEP_MODE must be 'wallet' or 'snapshot'")
+    sweep_schedule = os.getenv("SWEEP_SCHEDULE", "continuous").strip().lower()
+    if sweep_schedule not in ("continuous", "cycle"):
+        raise RuntimeError("SWEEP_SCHEDULE must be 'continuous' or 'cycle'")
+    sweep_tick_seconds = int(os.getenv("SWEEP_TICK_SECONDS") or "30")
+    reprioritize_price_move = float(os.getenv("REPRIORITIZE_PRICE_MOVE") or "0.2")
+    sweep_max_rps = float(os.getenv("SWEEP_MAX_RPS") or "10")
+    sweep_concurrency = int(os.getenv("SWEEP_CONCURRENCY") or "4")
     kick_on_fail = os.getenv("KICK_ON_FAIL", "true").lower() == "true"
+    holder_ws_enabled = os.getenv("HOLDER_WS_ENABLED", "false").lower() == "true"
+    reconcile_every_seconds = int(os.getenv("RECONCILE_EVERY_SECONDS") or str(24 * 60 * 60))
 
     db_path = os.getenv("DB_PATH", "contest.db").strip()
+    db_readers = int(os.getenv("DB_READERS") or "4")
+    flush_interval_ms = int(os.getenv("FLUSH_INTERVAL_MS") or "500")
+    flush_max_events = int(os.getenv("FLUSH_MAX_EVENTS") or "200")
+    dedup_capacity = int(os.getenv("DEDUP_CAPACITY") or "1000000")
+    archive_db_path = os.getenv("ARCHIVE_DB_PATH", "").strip() or os.path.splitext(db_path)[0] + "-archive.db"
+
+    contest_group_id = int(os.getenv("CONTEST_GROUP_ID") or "0")
 
-    contest_group_id = int(os.getenv("CONTEST_GROUP_ID", "0"))
+    # CONTESTS=name:group_id:mint[:min_usd],... (one shard per contest, next to
+    # DB_PATH); unset means one contest from CONTEST_GROUP_ID / TOKEN_MINT /
+    # MIN_HOLD_USD stored in DB_PATH itself
+    contests = parse_contests(os.getenv("CONTESTS", ""), min_hold_usd, db_path)
+    if not contests:
+        if not token_mint:
+            raise RuntimeError("TOKEN_MINT is required")
+        contests = (ContestSpec("default", contest_group_id, token_mint, min_hold_usd, db_path, archive_db_path),)
+
+    update_mode = os.getenv("UPDATE_MODE", "polling").strip().lower()
+    if update_mode not in ("polling", "webhook"):
+        raise RuntimeError("UPDATE_MODE must be 'polling' or 'webhook'")
+    webhook_url = os.getenv("WEBHOOK_URL", "").strip()
+    if update_mode == "webhook" and not webhook_url:
+        raise RuntimeError("WEBHOOK_URL is required when UPDATE_MODE=webhook")
+    webhook_path = os.getenv("WEBHOOK_PATH", "/telegram").strip()
+    webhook_secret = os.getenv("WEBHOOK_SECRET", "").strip()
+    webhook_host = os.getenv("WEBHOOK_HOST", "0.0.0.0").strip()
+    webhook_port = int(os.getenv("WEBHOOK_PORT") or os.getenv("PORT") or "8080")
+    webhook_max_concurrency = int(os.getenv("WEBHOOK_MAX_CONCURRENCY") or "100")
+
+    metrics_host = os.getenv("METRICS_HOST", "127.0.0.1").strip()
+    metrics_port = int(os.getenv("METRICS_PORT") or "0")
 
     return Config(
         bot_token=bot_token,
         admin_ids=admin_ids,
         sol_rpc_url=sol_rpc_url,
-        token_mint=token_mint,
-        min_hold_usd=min_hold_usd,
+        sol_ws_url=sol_ws_url,
+        rpc_limit_per_host=rpc_limit_per_host,
+        rpc_timeout_seconds=rpc_timeout_seconds,
+        dns_cache_seconds=dns_cache_seconds,
+        rpc_batch_size=rpc_batch_size,
+        rpc_balance_encoding=rpc_balance_encoding,
+        price_ttl_seconds=price_ttl_seconds,
+        balance_ttl_seconds=balance_ttl_seconds,
+        verify_cooldown_seconds=verify_cooldown_seconds,
+        outbox_global_rps=outbox_global_rps,
+        outbox_workers=outbox_workers,
         contest_days_default=contest_days_default,
         sweep_every_seconds=sweep_every_seconds,
+        sweep_mode=sweep_mode,
+        sweep_schedule=sweep_schedule,
+        sweep_tick_seconds=sweep_tick_seconds,
+        reprioritize_price_move=reprioritize_price_move,
+        sweep_max_rps=sweep_max_rps,
+        sweep_concurrency=sweep_concurrency,
         kick_on_fail=kick_on_fail,
-        db_path=db_path,
-        contest_group_id=contest_group_id,
+        holder_ws_enabled=holder_ws_enabled,
+        reconcile_every_seconds=reconcile_every_seconds,
+        db_readers=db_readers,
+        flush_interval_ms=flush_interval_ms,
+        flush_max_events=flush_max_events,
+        dedup_capacity=dedup_capacity,
+        contests=contests,
+        update_mode=update_mode,
+        webhook_url=webhook_url,
+        webhook_path=webhook_path,
+        webhook_secret=webhook_secret,
+        webhook_host=webhook_host,
+        webhook_port=webhook_port,
+        webhook_max_concurrency=webhook_max_concurrency,
+        metrics_host=metrics_host,
+        metrics_port=metrics_port,
     )
+
+
+def parse_contests(raw: str, default_min_usd: float, db_path: str) -> Tuple[ContestSpec, ...]:
+    """CONTESTS entries name:group_id:mint[:min_usd], comma separated."""
+    shard_dir = os.path.dirname(db_path)
+    specs = []
+    for entry in raw.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        parts = entry.split(":")
+        if len(parts) not in (3, 4):
+            raise RuntimeError(f"CONTESTS entry {entry!r} must be name:group_id:mint[:min_usd]")
+        name = parts[0].strip().lower()
+        if not CONTEST_NAME_RE.match(name):
+            raise RuntimeError(f"CONTESTS name {name!r} must be 1-32 of a-z, 0-9, _ or -")
+        shard = os.path.join(shard_dir, f"contest-{name}.db")
+        specs.append(ContestSpec(
+            name=name,
+            group_id=int(parts[1]),
+            token_mint=parts[2].strip(),
+            min_hold_usd=float(parts[3]) if len(parts) == 4 else default_min_usd,
+            db_path=shard,
+            archive_db_path=os.path.splitext(shard)[0] + "-archive.db",
+        ))
+    if len({s.name for s in specs}) != len(specs):
+        raise RuntimeError("CONTESTS names must be unique")
+    groups = [s.group_id for s in specs if s.group_id]
+    if len(set(groups)) != len(groups):
+        raise RuntimeError("CONTESTS group ids must be unique")
+    return tuple(specs)
+
@@ -0,0 +1,71 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional
+
+from .config import Config, ContestSpec
+from .db import AsyncDB
+
+
+@dataclass
+class Contest:
+    """One contest: its spec (group, mint, threshold, shard paths) and its own sqlite shard."""
+    spec: ContestSpec
+    db: AsyncDB
+    rendered: dict = field(default_factory=dict)  # message name -> (rows, text), see bot.render_cached
+
+    @property
+    def name(self) -> str:
+        return self.spec.name
+
+
+class Contests:
+    """
+    Every contest this process serves. Each one gets its own AsyncDB shard
+    (file and writer thread), so scoring in one group never queues behind
+    another group's writes; the shards share one pool of cfg.db_readers
+    reader threads, so adding contests doesn't multiply threads. Routing is a
+    dict lookup by group chat id (for_chat) or by name.
+    """
+
+    def __init__(self, cfg: Config):
+        self.by_name: Dict[str, Contest] = {}
+        self.by_chat: Dict[int, Contest] = {}
+        self._readers = ThreadPoolExecutor(max_workers=max(1, cfg.db_readers), thread_name_prefix="db-reader")
+        for spec in cfg.contests:
+            db = AsyncDB(
+                spec.db_path,
+                readers=cfg.db_readers,
+                flush_interval_ms=cfg.flush_interval_ms,
+                flush_max_events=cfg.flush_max_events,
+                dedup_capacity=cfg.dedup_capacity,
+                archive_path=spec.archive_db_path,
+                name=spec.name,
+                reader_pool=self._readers,
+            )
+            contest = Contest(spec, db)
+            self.by_name[spec.name] = contest
+            if spec.group_id != 0:
+                self.by_chat[spec.group_id] = contest
+
+    def __iter__(self) -> Iterator[Contest]:
+        return iter(self.by_name.values())
+
+    def __len__(self) -> int:
+        return len(self.by_name)
+
+    def for_chat(self, chat_id: int) -> Optional[Contest]:
+        return self.by_chat.get(chat_id)
+
+    def only(self) -> Optional[Contest]:
+        """The contest when there is exactly one."""
+        if len(self.by_name) == 1:
+            return next(iter(self.by_name.values()))
+        return None
+
+    async def init(self):
+        await asyncio.gather(*(c.db.init() for c in self))
+
+    async def close(self):
+        await asyncio.gather(*(c.db.close() for c in self))
+        self._readers.shutdown(wait=True)
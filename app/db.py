@@ -1,207 +1,380 @@
+import asyncio
+import os
 import sqlite3
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple
 
+from .dedup import ScoredKeys
+from .metrics import DB_SECONDS, QUEUE_DEPTH
+from .rank import RankIndex
+
 
 def now_ts() -> int:
     return int(time.time())
 
 
+# sqlite tuning applied to every pooled connection
+PRAGMAS = (
+    # archiving frees pages that reclaim_pages() hands back in small steps; a new
+    # file starts in this mode, an existing one switches on its next VACUUM (init)
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",     # readers never wait on the writer
+    "PRAGMA synchronous=NORMAL",   # fsync on checkpoint, not on every commit
+    "PRAGMA cache_size=-16000",    # ~16MB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+STATEMENT_CACHE_SIZE = 256
+# free pages released per incremental_vacuum step after archiving (4KB pages: ~4MB)
+VACUUM_STEP_PAGES = 1000
+MAX_SQLITE_INT = 2 ** 63 - 1
+
+
+# ---------- Schema migrations ----------
+# MIGRATIONS[i] brings the schema to version i + 1 (PRAGMA user_version).
+# Databases created before versioning start at 0; the early steps use
+# IF NOT EXISTS / column checks so they are no-ops on those.
+
+def _v1_base(cur):
+    # users + wallets
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users(
+      tg_id INTEGER PRIMARY KEY,
+      username TEXT,
+      wallet TEXT,
+      verified INTEGER DEFAULT 0,
+      joined_at INTEGER
+    )
+    """)
+
+    # points
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS points(
+      tg_id INTEGER PRIMARY KEY,
+      points INTEGER DEFAULT 0
+    )
+    """)
+
+    # contest state
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS contest(
+      id INTEGER PRIMARY KEY CHECK (id = 1),
+      start_ts INTEGER,
+      end_ts INTEGER,
+      is_active INTEGER DEFAULT 0
+    )
+    """)
+    cur.execute("INSERT OR IGNORE INTO contest(id, start_ts, end_ts, is_active) VALUES(1, NULL, NULL, 0)")
+
+    # NEW: meme ownership registry
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS memes(
+      chat_id INTEGER NOT NULL,
+      meme_message_id INTEGER NOT NULL,
+      owner_tg_id INTEGER NOT NULL,
+      created_ts INTEGER NOT NULL,
+      PRIMARY KEY(chat_id, meme_message_id)
+    )
+    """)
+
+    # NEW: prevent double scoring of replies
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS scored_replies(
+      chat_id INTEGER NOT NULL,
+      reply_message_id INTEGER NOT NULL,
+      created_ts INTEGER NOT NULL,
+      PRIMARY KEY(chat_id, reply_message_id)
+    )
+    """)
+
+    # NEW: prevent reaction toggle farming
+    # (1 point per user per meme)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS scored_reactions(
+      chat_id INTEGER NOT NULL,
+      meme_message_id INTEGER NOT NULL,
+      user_id INTEGER NOT NULL,
+      created_ts INTEGER NOT NULL,
+      PRIMARY KEY(chat_id, meme_message_id, user_id)
+    )
+    """)
+
+
+def _v2_sweep_columns(cur):
+    # sweep scheduler state
+    cols = {r["name"] for r in cur.execute("PRAGMA table_info(users)").fetchall()}
+    if "last_checked_ts" not in cols:
+        cur.execute("ALTER TABLE users ADD COLUMN last_checked_ts INTEGER")
+    if "last_balance_raw" not in cols:
+        cur.execute("ALTER TABLE users ADD COLUMN last_balance_raw INTEGER")
+
+
+def _v3_sweep_state(cur):
+    # sweep checkpoint: the current (or last) full cycle and how far it got
+    # (min_raw is TEXT: it can exceed sqlite's 64-bit INTEGER)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sweep_state(
+      id INTEGER PRIMARY KEY CHECK (id = 1),
+      cycle_id INTEGER DEFAULT 0,
+      started_ts INTEGER,
+      finished_ts INTEGER,
+      cursor_tg_id INTEGER,
+      price_usd REAL,
+      decimals INTEGER,
+      min_raw TEXT
+    )
+    """)
+    cur.execute("INSERT OR IGNORE INTO sweep_state(id, cycle_id) VALUES(1, 0)")
+
+
+def _v4_indexes(cur):
+    # /addpoints, /removepoints
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
+    # list_verified_users: verified=1 AND joined_at IS NOT NULL
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_verified_joined ON users(verified, joined_at)")
+    # member_rows (startup load of every participant), covering
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_members ON users(joined_at, username, verified)")
+    # leaderboard order: walk points high to low and stop after LIMIT
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_points_points ON points(points DESC)")
+
+
+def _v5_contest_ids(cur):
+    # contest.contest_id numbers contests (set_contest_days starts the next one);
+    # scoring rows are tagged with it so archive_contest can file them by contest.
+    # Rows from before tagging belong to contest 0, the one running now.
+    cur.execute("ALTER TABLE contest ADD COLUMN contest_id INTEGER NOT NULL DEFAULT 0")
+    for table in ("memes", "scored_replies", "scored_reactions"):
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN contest_id INTEGER NOT NULL DEFAULT 0")
+
+
+def _v6_next_check(cur):
+    # continuous sweep schedule: when each wallet is next due (set with every
+    # check from its headroom, see sweep.check_interval), so picking the due
+    # wallets is an index range instead of a pass over every participant.
+    # 0 (never checked, or from before scheduling) is due right away.
+    cur.execute("ALTER TABLE users ADD COLUMN next_check_ts INTEGER NOT NULL DEFAULT 0")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_next_check ON users(next_check_ts)")
+
+
+MIGRATIONS = (_v1_base, _v2_sweep_columns, _v3_sweep_state, _v4_indexes, _v5_contest_ids, _v6_next_check)
+
+# Per-contest scoring tables moved out of the live file by archive_contest:
+# their (all INTEGER) columns and the archive copy's primary key.
+ARCHIVED_TABLES = {
+    "memes": (
+        ("contest_id", "chat_id", "meme_message_id", "owner_tg_id", "created_ts"),
+        ("contest_id", "chat_id", "meme_message_id"),
+    ),
+    "scored_replies": (
+        ("contest_id", "chat_id", "reply_message_id", "created_ts"),
+        ("contest_id", "chat_id", "reply_message_id"),
+    ),
+    "scored_reactions": (
+        ("contest_id", "chat_id", "meme_message_id", "user_id", "created_ts"),
+        ("contest_id", "chat_id", "meme_message_id", "user_id"),
+    ),
+}
+
+
+def _archive_schema(con):
+    for table, (cols, key) in ARCHIVED_TABLES.items():
+        defs = ", ".join(f"{c} INTEGER NOT NULL" for c in cols)
+        con.execute(f"CREATE TABLE IF NOT EXISTS archive.{table}({defs}, PRIMARY KEY({', '.join(key)}))")
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS archive.contests(
+      contest_id INTEGER PRIMARY KEY,
+      start_ts INTEGER,
+      end_ts INTEGER,
+      archived_ts INTEGER,
+      memes INTEGER,
+      replies INTEGER,
+      reactions INTEGER
+    )
+    """)
+
+
 class DB:
     def __init__(self, path: str):
         self.path = path
+        self._local = threading.local()
+        self._all_conns = []
+        self._lock = threading.Lock()
 
     def conn(self):
-        c = sqlite3.connect(self.path)
-        c.row_factory = sqlite3.Row
+        # one long-lived connection per thread (reused across calls)
+        c = getattr(self._local, "con", None)
+        if c is None:
+            c = sqlite3.connect(self.path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+            c.row_factory = sqlite3.Row
+            for pragma in PRAGMAS:
+                c.execute(pragma)
+            self._local.con = c
+            with self._lock:
+                self._all_conns.append(c)
         return c
 
+    def close(self):
+        with self._lock:
+            for c in self._all_conns:
+                c.close()
+            self._all_conns.clear()
+        self._local = threading.local()
+
     def init(self):
+        """Apply pending MIGRATIONS, one transaction per version."""
         con = self.conn()
-        cur = con.cursor()
-
-        # users + wallets
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS users(
-          tg_id INTEGER PRIMARY KEY,
-          username TEXT,
-          wallet TEXT,
-          verified INTEGER DEFAULT 0,
-          joined_at INTEGER
-        )
-        """)
-
-        # points
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS points(
-          tg_id INTEGER PRIMARY KEY,
-          points INTEGER DEFAULT 0
-        )
-        """)
-
-        # contest state
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS contest(
-          id INTEGER PRIMARY KEY CHECK (id = 1),
-          start_ts INTEGER,
-          end_ts INTEGER,
-          is_active INTEGER DEFAULT 0
-        )
-        """)
-        cur.execute("INSERT OR IGNORE INTO contest(id, start_ts, end_ts, is_active) VALUES(1, NULL, NULL, 0)")
-
-        # NEW: meme ownership registry
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS memes(
-          chat_id INTEGER NOT NULL,
-          meme_message_id INTEGER NOT NULL,
-          owner_tg_id INTEGER NOT NULL,
-          created_ts INTEGER NOT NULL,
-          PRIMARY KEY(chat_id, meme_message_id)
-        )
-        """)
-
-        # NEW: prevent double scoring of replies
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS scored_replies(
-          chat_id INTEGER NOT NULL,
-          reply_message_id INTEGER NOT NULL,
-          created_ts INTEGER NOT NULL,
-          PRIMARY KEY(chat_id, reply_message_id)
-        )
-        """)
-
-        # NEW: prevent reaction toggle farming
-        # (1 point per user per meme)
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS scored_reactions(
-          chat_id INTEGER NOT NULL,
-          meme_message_id INTEGER NOT NULL,
-          user_id INTEGER NOT NULL,
-          created_ts INTEGER NOT NULL,
-          PRIMARY KEY(chat_id, meme_message_id, user_id)
-        )
-        """)
-
-        con.commit()
-        con.close()
+        version = con.execute("PRAGMA user_version").fetchone()[0]
+        for target, migrate in enumerate(MIGRATIONS[version:], start=version + 1):
+            cur = con.cursor()
+            cur.execute("BEGIN")
+            try:
+                migrate(cur)
+                cur.execute(f"PRAGMA user_version={target}")
+            except Exception:
+                con.rollback()
+                raise
+            con.commit()
+            print(f"[DB] Schema migrated to version {target}")
+        if con.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # one full rewrite of a file from before incremental mode; can't run
+            # inside a migration's transaction
+            con.execute("VACUUM")
+            print("[DB] Switched to incremental auto_vacuum")
 
     # ---------- Users ----------
+    @DB_SECONDS.timed()
     def ensure_user(self, tg_id: int, username: str):
-        con = self.conn()
-        con.execute("INSERT OR IGNORE INTO users(tg_id, username, joined_at) VALUES(?,?,NULL)", (tg_id, username))
-        con.execute("UPDATE users SET username=? WHERE tg_id=?", (username, tg_id))
-        con.execute("INSERT OR IGNORE INTO points(tg_id, points) VALUES(?,0)", (tg_id,))
-        con.commit()
-        con.close()
+        with self.conn() as con:
+            con.execute("INSERT OR IGNORE INTO users(tg_id, username, joined_at) VALUES(?,?,NULL)", (tg_id, username))
+            con.execute("UPDATE users SET username=? WHERE tg_id=?", (username, tg_id))
+            con.execute("INSERT OR IGNORE INTO points(tg_id, points) VALUES(?,0)", (tg_id,))
 
+    @DB_SECONDS.timed()
     def get_user(self, tg_id: int):
-        con = self.conn()
-        row = con.execute("SELECT * FROM users WHERE tg_id=?", (tg_id,)).fetchone()
-        con.close()
-        return row
+        return self.conn().execute("SELECT * FROM users WHERE tg_id=?", (tg_id,)).fetchone()
 
+    @DB_SECONDS.timed()
     def set_verified(self, tg_id: int, wallet: str, verified: int):
-        con = self.conn()
-        con.execute("UPDATE users SET wallet=?, verified=? WHERE tg_id=?", (wallet, verified, tg_id))
-        con.commit()
-        con.close()
+        with self.conn() as con:
+            con.execute("UPDATE users SET wallet=?, verified=? WHERE tg_id=?", (wallet, verified, tg_id))
 
+    @DB_SECONDS.timed()
     def mark_joined(self, tg_id: int):
-        con = self.conn()
-        con.execute("UPDATE users SET joined_at=? WHERE tg_id=? AND joined_at IS NULL", (now_ts(), tg_id))
-        con.commit()
-        con.close()
+        with self.conn() as con:
+            con.execute("UPDATE users SET joined_at=? WHERE tg_id=? AND joined_at IS NULL", (now_ts(), tg_id))
 
+    @DB_SECONDS.timed()
     def list_verified_users(self, only_joined: bool = True):
         con = self.conn()
         if only_joined:
-            rows = con.execute("""
-              SELECT tg_id, wallet, username
+            return con.execute("""
+              SELECT tg_id, wallet, username, last_checked_ts, last_balance_raw
               FROM users
               WHERE verified=1 AND wallet IS NOT NULL AND joined_at IS NOT NULL
             """).fetchall()
-        else:
-            rows = con.execute("""
-              SELECT tg_id, wallet, username
-              FROM users
-              WHERE verified=1 AND wallet IS NOT NULL
-            """).fetchall()
-        con.close()
-        return rows
+        return con.execute("""
+          SELECT tg_id, wallet, username, last_checked_ts, last_balance_raw
+          FROM users
+          WHERE verified=1 AND wallet IS NOT NULL
+        """).fetchall()
+
+    @DB_SECONDS.timed()
+    def list_verified_page(self, after_tg_id: int, limit: int):
+        """Verified + joined users with tg_id > after_tg_id, in tg_id order."""
+        return self.conn().execute("""
+          SELECT tg_id, wallet, username, last_checked_ts, last_balance_raw
+          FROM users
+          WHERE +verified=1 AND wallet IS NOT NULL AND joined_at IS NOT NULL AND tg_id > ?
+          ORDER BY tg_id  -- "+verified": walk the primary key instead of sorting every participant per page
+          LIMIT ?
+        """, (after_tg_id, limit)).fetchall()
 
+    def _record_checks(self, con, checks: list):
+        # u64 balances can overflow sqlite's INTEGER; anything that large is far above any minimum
+        con.executemany(
+            "UPDATE users SET last_checked_ts=?, last_balance_raw=?, next_check_ts=? WHERE tg_id=?",
+            [(ts, min(bal, MAX_SQLITE_INT), next_ts, tg_id) for tg_id, ts, bal, next_ts in checks]
+        )
+
+    @DB_SECONDS.timed()
+    def record_checks(self, checks: list):
+        """Store sweep results: [(tg_id, checked_ts, balance_raw, next_check_ts), ...]."""
+        with self.conn() as con:
+            self._record_checks(con, checks)
+
+    @DB_SECONDS.timed()
+    def reschedule_checks(self, schedule: list):
+        """Move next checks: [(tg_id, next_check_ts), ...]."""
+        with self.conn() as con:
+            con.executemany("UPDATE users SET next_check_ts=? WHERE tg_id=?", [(ts, tg_id) for tg_id, ts in schedule])
+
+    @DB_SECONDS.timed()
+    def due_for_check(self, now: int, limit: int):
+        """Verified + joined users whose next check is due at now, most overdue first."""
+        return self.conn().execute("""
+          SELECT tg_id, wallet, username, last_checked_ts, last_balance_raw
+          FROM users
+          WHERE next_check_ts <= ? AND +verified=1 AND wallet IS NOT NULL AND +joined_at IS NOT NULL
+          ORDER BY next_check_ts  -- "+": walk idx_users_next_check, not the verified/joined indexes
+          LIMIT ?
+        """, (now, limit)).fetchall()
+
+    @DB_SECONDS.timed()
+    def count_due(self, now: int) -> int:
+        return self.conn().execute("""
+          SELECT COUNT(*) FROM users
+          WHERE next_check_ts <= ? AND +verified=1 AND wallet IS NOT NULL AND +joined_at IS NOT NULL
+        """, (now,)).fetchone()[0]
+
+    @DB_SECONDS.timed()
     def unverify_and_optionally_kick(self, tg_id: int, kick_from_contest: bool):
-        con = self.conn()
-        if kick_from_contest:
-            con.execute("UPDATE users SET verified=0, joined_at=NULL WHERE tg_id=?", (tg_id,))
-        else:
-            con.execute("UPDATE users SET verified=0 WHERE tg_id=?", (tg_id,))
-        con.commit()
-        con.close()
+        with self.conn() as con:
+            if kick_from_contest:
+                con.execute("UPDATE users SET verified=0, joined_at=NULL WHERE tg_id=?", (tg_id,))
+            else:
+                con.execute("UPDATE users SET verified=0 WHERE tg_id=?", (tg_id,))
 
+    @DB_SECONDS.timed()
     def find_user_by_username(self, username: str) -> Optional[int]:
-        con = self.conn()
-        row = con.execute("SELECT tg_id FROM users WHERE username=?", (username,)).fetchone()
-        con.close()
+        row = self.conn().execute("SELECT tg_id FROM users WHERE username=?", (username,)).fetchone()
         return int(row["tg_id"]) if row else None
 
     # ---------- Points ----------
+    @DB_SECONDS.timed()
     def add_points(self, tg_id: int, delta: int):
-        con = self.conn()
-        con.execute("UPDATE points SET points = COALESCE(points,0) + ? WHERE tg_id=?", (delta, tg_id))
-        con.commit()
-        con.close()
-
-    def get_rank(self, tg_id: int) -> Optional[Tuple[int, int]]:
-        con = self.conn()
-        rows = con.execute("""
-          SELECT u.tg_id, p.points, u.joined_at
+        with self.conn() as con:
+            con.execute("UPDATE points SET points = COALESCE(points,0) + ? WHERE tg_id=?", (delta, tg_id))
+
+    @DB_SECONDS.timed()
+    def member_rows(self):
+        """(tg_id, username, points, joined_at, verified) for every joined participant, unordered."""
+        return self.conn().execute("""
+          SELECT u.tg_id, u.username, p.points, u.joined_at, u.verified
           FROM points p
           JOIN users u ON u.tg_id = p.tg_id
           WHERE u.joined_at IS NOT NULL
-          ORDER BY p.points DESC, u.joined_at ASC
         """).fetchall()
-        con.close()
-        for i, r in enumerate(rows, start=1):
-            if int(r["tg_id"]) == tg_id:
-                return (i, int(r["points"]))
-        return None
-
-    def top_leaderboard(self, limit: int = 10):
-        con = self.conn()
-        rows = con.execute("""
-          SELECT u.username, u.tg_id, p.points
-          FROM points p
-          JOIN users u ON u.tg_id = p.tg_id
-          WHERE u.joined_at IS NOT NULL
-          ORDER BY p.points DESC, u.joined_at ASC
-          LIMIT ?
-        """, (limit,)).fetchall()
-        con.close()
-        return rows
 
-    def top_n(self, n: int = 3):
-        con = self.conn()
-        rows = con.execute("""
-          SELECT u.username, u.tg_id, p.points
-          FROM points p
-          JOIN users u ON u.tg_id = p.tg_id
-          WHERE u.joined_at IS NOT NULL
-          ORDER BY p.points DESC, u.joined_at ASC
-          LIMIT ?
-        """, (n,)).fetchall()
-        con.close()
-        return rows
+    @DB_SECONDS.timed()
+    def member_row(self, tg_id: int):
+        return self.conn().execute("""
+          SELECT u.tg_id, u.username, p.points, u.joined_at, u.verified
+          FROM users u
+          LEFT JOIN points p ON p.tg_id = u.tg_id
+          WHERE u.tg_id = ?
+        """, (tg_id,)).fetchone()
 
     # ---------- Contest ----------
+    @DB_SECONDS.timed()
     def contest_status(self):
-        con = self.conn()
-        row = con.execute("SELECT start_ts, end_ts, is_active FROM contest WHERE id=1").fetchone()
-        con.close()
+        row = self.conn().execute("SELECT start_ts, end_ts, is_active FROM contest WHERE id=1").fetchone()
         if not row:
             return (False, None, None)
         return (bool(row["is_active"]), row["start_ts"], row["end_ts"])
 
+    @DB_SECONDS.timed()
     def contest_is_live(self) -> bool:
         active, start_ts, end_ts = self.contest_status()
         if not active or not start_ts or not end_ts:
@@ -209,68 +382,557 @@ class DB:
         t = now_ts()
         return start_ts <= t <= end_ts
 
+    @DB_SECONDS.timed()
     def set_contest_days(self, days: int):
+        """Start the next contest (new contest_id) running for `days`."""
         start = now_ts()
         end = start + days * 24 * 60 * 60
-        con = self.conn()
-        con.execute("UPDATE contest SET start_ts=?, end_ts=?, is_active=1 WHERE id=1", (start, end))
-        con.commit()
-        con.close()
+        with self.conn() as con:
+            con.execute(
+                "UPDATE contest SET start_ts=?, end_ts=?, is_active=1, contest_id=contest_id+1 WHERE id=1",
+                (start, end)
+            )
 
+    @DB_SECONDS.timed()
     def end_contest(self):
+        with self.conn() as con:
+            con.execute("UPDATE contest SET is_active=0 WHERE id=1")
+
+    @DB_SECONDS.timed()
+    def archive_contest(self, archive_path: str) -> dict:
+        """
+        Move every memes / scored_replies / scored_reactions row into the
+        archive database at archive_path, update the current contest's summary
+        row there. Only call this between contests: everything in the live
+        tables then belongs to finished ones. The freed pages stay in the live
+        file until reclaim_pages(). Returns {table: rows moved}.
+        """
+        con = self.conn()
+        con.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+        try:
+            with con:
+                _archive_schema(con)
+                moved = {}
+                for table, (cols, _) in ARCHIVED_TABLES.items():
+                    cols = ", ".join(cols)
+                    cur = con.execute(f"INSERT OR IGNORE INTO archive.{table}({cols}) SELECT {cols} FROM main.{table}")
+                    moved[table] = cur.rowcount
+                    con.execute(f"DELETE FROM main.{table}")
+                if any(moved.values()):
+                    con.execute("""
+                      INSERT OR REPLACE INTO archive.contests
+                      SELECT c.contest_id, c.start_ts, c.end_ts, ?,
+                        (SELECT COUNT(*) FROM archive.memes WHERE contest_id=c.contest_id),
+                        (SELECT COUNT(*) FROM archive.scored_replies WHERE contest_id=c.contest_id),
+                        (SELECT COUNT(*) FROM archive.scored_reactions WHERE contest_id=c.contest_id)
+                      FROM main.contest c WHERE c.id=1
+                    """, (now_ts(),))
+        finally:
+            con.execute("DETACH DATABASE archive")
+        return moved
+
+    @DB_SECONDS.timed()
+    def reclaim_pages(self, max_pages: int) -> int:
+        """Release up to max_pages free pages to the filesystem; returns how many were released."""
         con = self.conn()
-        con.execute("UPDATE contest SET is_active=0 WHERE id=1")
-        con.commit()
-        con.close()
+        free = con.execute("PRAGMA freelist_count").fetchone()[0]
+        con.execute(f"PRAGMA incremental_vacuum({int(max_pages)})").fetchall()  # one page per step
+        return free - con.execute("PRAGMA freelist_count").fetchone()[0]
 
     # ---------- Meme scoring storage ----------
+    @DB_SECONDS.timed()
     def insert_meme(self, chat_id: int, meme_message_id: int, owner_tg_id: int) -> bool:
-        con = self.conn()
         try:
-            con.execute(
-                "INSERT INTO memes(chat_id, meme_message_id, owner_tg_id, created_ts) VALUES(?,?,?,?)",
-                (chat_id, meme_message_id, owner_tg_id, now_ts())
-            )
-            con.commit()
+            with self.conn() as con:
+                con.execute(
+                    "INSERT INTO memes(chat_id, meme_message_id, owner_tg_id, created_ts, contest_id) "
+                    "SELECT ?, ?, ?, ?, contest_id FROM contest WHERE id=1",
+                    (chat_id, meme_message_id, owner_tg_id, now_ts())
+                )
             return True
         except Exception:
             return False
-        finally:
-            con.close()
 
+    @DB_SECONDS.timed()
     def get_meme_owner(self, chat_id: int, meme_message_id: int) -> Optional[int]:
-        con = self.conn()
-        row = con.execute(
+        row = self.conn().execute(
             "SELECT owner_tg_id FROM memes WHERE chat_id=? AND meme_message_id=?",
             (chat_id, meme_message_id)
         ).fetchone()
-        con.close()
         return int(row["owner_tg_id"]) if row else None
 
+    @DB_SECONDS.timed()
     def mark_reply_scored(self, chat_id: int, reply_message_id: int) -> bool:
-        con = self.conn()
-        try:
-            con.execute(
-                "INSERT INTO scored_replies(chat_id, reply_message_id, created_ts) VALUES(?,?,?)",
+        with self.conn() as con:
+            cur = con.execute(
+                "INSERT OR IGNORE INTO scored_replies(chat_id, reply_message_id, created_ts, contest_id) "
+                "SELECT ?, ?, ?, contest_id FROM contest WHERE id=1",
                 (chat_id, reply_message_id, now_ts())
             )
-            con.commit()
-            return True
-        except Exception:
-            return False
-        finally:
-            con.close()
-
+        return cur.rowcount == 1
+
+    @DB_SECONDS.timed()
+    def reply_scored(self, chat_id: int, reply_message_id: int) -> bool:
+        return self.conn().execute(
+            "SELECT 1 FROM scored_replies WHERE chat_id=? AND reply_message_id=?",
+            (chat_id, reply_message_id)
+        ).fetchone() is not None
+
+    @DB_SECONDS.timed()
+    def reaction_scored(self, chat_id: int, meme_message_id: int, user_id: int) -> bool:
+        return self.conn().execute(
+            "SELECT 1 FROM scored_reactions WHERE chat_id=? AND meme_message_id=? AND user_id=?",
+            (chat_id, meme_message_id, user_id)
+        ).fetchone() is not None
+
+    @DB_SECONDS.timed()
     def mark_reaction_scored(self, chat_id: int, meme_message_id: int, user_id: int) -> bool:
-        con = self.conn()
-        try:
-            con.execute(
-                "INSERT INTO scored_reactions(chat_id, meme_message_id, user_id, created_ts) VALUES(?,?,?,?)",
+        with self.conn() as con:
+            cur = con.execute(
+                "INSERT OR IGNORE INTO scored_reactions(chat_id, meme_message_id, user_id, created_ts, contest_id) "
+                "SELECT ?, ?, ?, ?, contest_id FROM contest WHERE id=1",
                 (chat_id, meme_message_id, user_id, now_ts())
             )
-            con.commit()
-            return True
-        except Exception:
+        return cur.rowcount == 1
+
+    # Streaming cursors of plain tuples over every scored key, for AsyncDB's
+    # dedup index. Iterate them on the thread that called.
+    def _key_cursor(self, sql: str):
+        cur = self.conn().cursor()
+        cur.row_factory = None
+        return cur.execute(sql)
+
+    def scored_reply_keys(self):
+        return self._key_cursor("SELECT chat_id, reply_message_id FROM scored_replies")
+
+    def scored_reaction_keys(self):
+        return self._key_cursor("SELECT chat_id, meme_message_id, user_id FROM scored_reactions")
+
+    # ---------- Sweep checkpoint ----------
+    @DB_SECONDS.timed()
+    def sweep_checkpoint(self):
+        return self.conn().execute("SELECT * FROM sweep_state WHERE id=1").fetchone()
+
+    @DB_SECONDS.timed()
+    def start_sweep_cycle(self, price_usd: float, decimals: int, min_raw: int) -> int:
+        with self.conn() as con:
+            con.execute("""
+              UPDATE sweep_state
+              SET cycle_id=cycle_id+1, started_ts=?, finished_ts=NULL, cursor_tg_id=0,
+                  price_usd=?, decimals=?, min_raw=?
+              WHERE id=1
+            """, (now_ts(), price_usd, decimals, str(min_raw)))
+            return con.execute("SELECT cycle_id FROM sweep_state WHERE id=1").fetchone()["cycle_id"]
+
+    @DB_SECONDS.timed()
+    def save_sweep_progress(self, cycle_id: int, cursor_tg_id: int, checks: list):
+        """Store a page of results and advance the cursor in one transaction."""
+        with self.conn() as con:
+            self._record_checks(con, checks)
+            con.execute(
+                "UPDATE sweep_state SET cursor_tg_id=? WHERE id=1 AND cycle_id=?",
+                (cursor_tg_id, cycle_id)
+            )
+
+    @DB_SECONDS.timed()
+    def finish_sweep_cycle(self, cycle_id: int):
+        with self.conn() as con:
+            con.execute("UPDATE sweep_state SET finished_ts=? WHERE id=1 AND cycle_id=?", (now_ts(), cycle_id))
+
+    # ---------- Batched writes ----------
+    @DB_SECONDS.timed()
+    def apply_batch(self, points: dict, memes: dict, replies: dict, reactions: dict):
+        """
+        Apply buffered scoring in one transaction:
+        points {tg_id: delta}, memes {(chat_id, meme_message_id): (owner_tg_id, ts)},
+        replies {(chat_id, reply_message_id): ts}, reactions {(chat_id, meme_message_id, user_id): ts}.
+        Rows are tagged with the current contest_id.
+        """
+        with self.conn() as con:
+            cid = con.execute("SELECT contest_id FROM contest WHERE id=1").fetchone()["contest_id"]
+            con.executemany(
+                "INSERT OR IGNORE INTO memes(chat_id, meme_message_id, owner_tg_id, created_ts, contest_id) VALUES(?,?,?,?,?)",
+                [(c, mid, owner, ts, cid) for (c, mid), (owner, ts) in memes.items()]
+            )
+            con.executemany(
+                "INSERT OR IGNORE INTO scored_replies(chat_id, reply_message_id, created_ts, contest_id) VALUES(?,?,?,?)",
+                [(c, rid, ts, cid) for (c, rid), ts in replies.items()]
+            )
+            con.executemany(
+                "INSERT OR IGNORE INTO scored_reactions(chat_id, meme_message_id, user_id, created_ts, contest_id) VALUES(?,?,?,?,?)",
+                [(c, mid, uid, ts, cid) for (c, mid, uid), ts in reactions.items()]
+            )
+            con.executemany(
+                "UPDATE points SET points = COALESCE(points,0) + ? WHERE tg_id=?",
+                [(delta, tg_id) for tg_id, delta in points.items() if delta]
+            )
+
+
+class AsyncDB:
+    """
+    Async facade over DB with the same method names.
+    Writes run on a single dedicated writer thread; reads run on a small pool of
+    reader threads. Each thread keeps its own long-lived WAL connection, so
+    handlers await storage instead of blocking the event loop, and readers never
+    queue behind writers.
+
+    Hot-path state lives in memory, loaded in init() and kept in sync by the
+    methods that change it:
+    - ranks: RankIndex of joined participants (add_points, mark_joined, unverify);
+      it also answers top_leaderboard / top_n, with usernames from `usernames`
+    - contest window (set_contest_days, end_contest)
+    - eligible: tg_ids that are verified + joined (set_verified, mark_joined, unverify)
+    so contest_status / contest_is_live / is_eligible / get_rank and the
+    leaderboard reads never touch sqlite.
+
+    Scoring writes are write-behind: add_points deltas and the memes /
+    scored_replies / scored_reactions inserts are buffered in memory and applied
+    by flush() in one transaction every flush_interval_ms, as soon as
+    flush_max_events are pending, and on close(). Reads consult the buffer, so
+    dedup, meme ownership and ranks already reflect unflushed events.
+
+    Reply / reaction dedup goes through ScoredKeys indexes (Bloom filters plus
+    recent keys, dedup_capacity keys per filter before it chains a larger one),
+    loaded from sqlite in init(): new keys and repeats of recent ones are
+    answered in memory, only a Bloom "maybe" costs a sqlite read.
+
+    Between contests (end_contest, and set_contest_days for anything left
+    over) the scoring tables are moved to archive_path and the live file is
+    shrunk in small incremental_vacuum steps between other writes, so lookups
+    and the dedup indexes only cover the current contest.
+    """
+
+    def __init__(self, path: str, readers: int = 4, flush_interval_ms: int = 500, flush_max_events: int = 200,
+                 dedup_capacity: int = 1_000_000, archive_path: Optional[str] = None, name: str = "default",
+                 reader_pool: Optional[ThreadPoolExecutor] = None):
+        self.db = DB(path)
+        self.name = name
+        self.archive_path = archive_path or os.path.splitext(path)[0] + "-archive.db"
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        # a shared reader_pool (several shards, see app.contests) is shut down by its owner
+        self._own_readers = reader_pool is None
+        self._readers = reader_pool or ThreadPoolExecutor(max_workers=max(1, readers), thread_name_prefix="db-reader")
+        self.ranks = RankIndex()
+        self.usernames = {}  # tg_id -> username, for joined participants
+        self.last_scored = {}  # tg_id -> ts of the last positive add_points (since startup)
+        self.eligible = set()
+        self._contest = (False, None, None)
+        self.dedup_capacity = dedup_capacity
+        self.scored_replies = ScoredKeys("replies", dedup_capacity)
+        self.scored_reactions = ScoredKeys("reactions", dedup_capacity)
+
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_max_events = flush_max_events
+        self._pending_points = {}     # tg_id -> delta
+        self._pending_memes = {}      # (chat_id, meme_message_id) -> (owner_tg_id, ts)
+        self._pending_replies = {}    # (chat_id, reply_message_id) -> ts
+        self._pending_reactions = {}  # (chat_id, meme_message_id, user_id) -> ts
+        self._pending_events = 0
+        self._flushing = ({}, {}, {}, {})  # batch currently being written, same shape
+        self._flushes = 0  # completed flushes, see _settled_read
+        self._flush_lock = asyncio.Lock()
+        self._flush_wanted = asyncio.Event()
+        self._flusher = None
+        QUEUE_DEPTH.set_function(lambda: self._pending_events, f"db_write_behind:{name}")
+
+    async def _write(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, fn, *args)
+
+    async def _read(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, fn, *args)
+
+    async def init(self):
+        await self._write(self.db.init)
+        rows = await self._read(self.db.member_rows)
+        self.ranks.load(rows)
+        self.usernames = {int(r["tg_id"]): r["username"] for r in rows}
+        self.eligible = {int(r["tg_id"]) for r in rows if int(r["verified"] or 0) == 1}
+        self._contest = await self._read(self.db.contest_status)
+        await self._load_dedup()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _refresh_member(self, tg_id: int):
+        # read on the writer thread so it is ordered after the write it follows;
+        # the flush lock keeps a flush from landing between the read and the
+        # pending-delta lookup below
+        async with self._flush_lock:
+            row = await self._write(self.db.member_row, tg_id)
+            pending = self._pending_points.get(tg_id, 0)
+        if row is None or row["joined_at"] is None:
+            self.ranks.remove(tg_id)
+            self.usernames.pop(tg_id, None)
+            self.eligible.discard(tg_id)
+            return
+        self.ranks.upsert(tg_id, int(row["points"] or 0) + pending, int(row["joined_at"]))
+        self.usernames[tg_id] = row["username"]
+        if int(row["verified"] or 0) == 1:
+            self.eligible.add(tg_id)
+        else:
+            self.eligible.discard(tg_id)
+
+    async def _refresh_contest(self):
+        self._contest = await self._write(self.db.contest_status)
+
+    async def _load_dedup(self):
+        """
+        (Re)build the dedup indexes from sqlite plus unflushed keys. The flush
+        lock keeps keys from moving buffer -> sqlite behind the load; the
+        indexes are refilled in place so in-flight checks keep a live index.
+        """
+        async with self._flush_lock:
+            replies = ScoredKeys("replies", self.dedup_capacity)
+            reactions = ScoredKeys("reactions", self.dedup_capacity)
+            # the cursors are created and drained on the same reader thread
+            await self._read(lambda: replies.load(self.db.scored_reply_keys()))
+            await self._read(lambda: reactions.load(self.db.scored_reaction_keys()))
+            replies.load(self._pending_replies)
+            reactions.load(self._pending_reactions)
+            self.scored_replies.take(replies)
+            self.scored_reactions.take(reactions)
+
+    async def _archive(self):
+        """Move finished contests' scoring rows to the archive file and shrink the live one."""
+        await self.flush()
+        moved = await self._write(self.db.archive_contest, self.archive_path)
+        if any(moved.values()):
+            print(f"[DB] Archived to {self.archive_path}: " + ", ".join(f"{n} {t}" for t, n in moved.items()))
+            await self._load_dedup()
+        # one writer job per step, so flushes queued meanwhile run in between
+        while await self._write(self.db.reclaim_pages, VACUUM_STEP_PAGES):
+            pass
+
+    # ---------- Write-behind ----------
+    def _buffered(self):
+        self._pending_events += 1
+        if self._pending_events >= self.flush_max_events:
+            self._flush_wanted.set()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wanted.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wanted.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[DB] Flush failed, will retry: {e}")
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending_events:
+                return
+            batch = (self._pending_points, self._pending_memes, self._pending_replies, self._pending_reactions)
+            self._pending_points, self._pending_memes = {}, {}
+            self._pending_replies, self._pending_reactions = {}, {}
+            self._pending_events = 0
+            self._flushing = batch
+            try:
+                await self._write(self.db.apply_batch, *batch)
+                self._flushes += 1
+            except Exception:
+                # put the batch back in front of anything buffered meanwhile
+                points, memes, replies, reactions = batch
+                for tg_id, delta in self._pending_points.items():
+                    points[tg_id] = points.get(tg_id, 0) + delta
+                memes.update(self._pending_memes)
+                replies.update(self._pending_replies)
+                reactions.update(self._pending_reactions)
+                self._pending_points, self._pending_memes = points, memes
+                self._pending_replies, self._pending_reactions = replies, reactions
+                self._pending_events = len(points) + len(memes) + len(replies) + len(reactions)
+                raise
+            finally:
+                self._flushing = ({}, {}, {}, {})
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        if self._own_readers:
+            self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+        self.db.close()
+
+    # ---------- Users ----------
+    async def ensure_user(self, tg_id: int, username: str):
+        await self._write(self.db.ensure_user, tg_id, username)
+        if tg_id in self.usernames:
+            self.usernames[tg_id] = username
+
+    async def get_user(self, tg_id: int):
+        return await self._read(self.db.get_user, tg_id)
+
+    async def set_verified(self, tg_id: int, wallet: str, verified: int):
+        await self._write(self.db.set_verified, tg_id, wallet, verified)
+        await self._refresh_member(tg_id)
+
+    async def mark_joined(self, tg_id: int):
+        await self._write(self.db.mark_joined, tg_id)
+        await self._refresh_member(tg_id)
+
+    async def list_verified_users(self, only_joined: bool = True):
+        return await self._read(self.db.list_verified_users, only_joined)
+
+    async def unverify_and_optionally_kick(self, tg_id: int, kick_from_contest: bool):
+        await self._write(self.db.unverify_and_optionally_kick, tg_id, kick_from_contest)
+        await self._refresh_member(tg_id)
+
+    async def list_verified_page(self, after_tg_id: int, limit: int):
+        return await self._read(self.db.list_verified_page, after_tg_id, limit)
+
+    async def record_checks(self, checks: list):
+        await self._write(self.db.record_checks, checks)
+
+    async def reschedule_checks(self, schedule: list):
+        await self._write(self.db.reschedule_checks, schedule)
+
+    async def due_for_check(self, now: int, limit: int):
+        return await self._read(self.db.due_for_check, now, limit)
+
+    async def count_due(self, now: int) -> int:
+        return await self._read(self.db.count_due, now)
+
+    async def is_eligible(self, tg_id: int) -> bool:
+        """Verified + joined (may earn points)."""
+        return tg_id in self.eligible
+
+    async def find_user_by_username(self, username: str) -> Optional[int]:
+        return await self._read(self.db.find_user_by_username, username)
+
+    # ---------- Points ----------
+    async def add_points(self, tg_id: int, delta: int):
+        self._pending_points[tg_id] = self._pending_points.get(tg_id, 0) + delta
+        self.ranks.add(tg_id, delta)
+        if delta > 0:
+            self.last_scored[tg_id] = now_ts()
+        self._buffered()
+
+    async def get_rank(self, tg_id: int) -> Optional[Tuple[int, int]]:
+        return self.ranks.rank(tg_id)
+
+    async def top_leaderboard(self, limit: int = 10):
+        return [
+            {"username": self.usernames.get(tg_id), "tg_id": tg_id, "points": points}
+            for tg_id, points in self.ranks.top(limit)
+        ]
+
+    async def top_n(self, n: int = 3):
+        return await self.top_leaderboard(n)
+
+    # ---------- Contest ----------
+    async def contest_status(self):
+        return self._contest
+
+    async def contest_is_live(self) -> bool:
+        active, start_ts, end_ts = self._contest
+        if not active or not start_ts or not end_ts:
             return False
-        finally:
-            con.close()
+        return start_ts <= now_ts() <= end_ts
+
+    async def set_contest_days(self, days: int):
+        await self._archive()  # leftovers from the previous contest
+        await self._write(self.db.set_contest_days, days)
+        await self._refresh_contest()
+
+    async def end_contest(self):
+        await self.flush()
+        await self._write(self.db.end_contest)
+        await self._refresh_contest()
+        await self._archive()
+
+    # ---------- Sweep checkpoint ----------
+    async def sweep_checkpoint(self):
+        return await self._read(self.db.sweep_checkpoint)
+
+    async def start_sweep_cycle(self, price_usd: float, decimals: int, min_raw: int) -> int:
+        return await self._write(self.db.start_sweep_cycle, price_usd, decimals, min_raw)
+
+    async def save_sweep_progress(self, cycle_id: int, cursor_tg_id: int, checks: list):
+        await self._write(self.db.save_sweep_progress, cycle_id, cursor_tg_id, checks)
+
+    async def finish_sweep_cycle(self, cycle_id: int):
+        await self._write(self.db.finish_sweep_cycle, cycle_id)
+
+    # ---------- Meme scoring storage ----------
+    # Unflushed keys live in the pending buffer or the batch being flushed.
+    # They are checked again after each await: another handler may have
+    # buffered the same key while this one was reading. The sqlite reads go
+    # through _settled_read, so a key can't slip between the two: flushed
+    # behind a reader's snapshot and already gone from the buffer.
+    async def _settled_read(self, fn, *args):
+        """
+        _read that is never older than the buffer: if a flush completed while
+        fn ran, its snapshot may predate that commit, so read again.
+        """
+        while True:
+            flushes = self._flushes
+            result = await self._read(fn, *args)
+            if flushes == self._flushes:
+                return result
+
+    def _unflushed_meme(self, key):
+        return self._pending_memes.get(key) or self._flushing[1].get(key)
+
+    def _unflushed_reply(self, key) -> bool:
+        return key in self._pending_replies or key in self._flushing[2]
+
+    def _unflushed_reaction(self, key) -> bool:
+        return key in self._pending_reactions or key in self._flushing[3]
+
+    async def insert_meme(self, chat_id: int, meme_message_id: int, owner_tg_id: int) -> bool:
+        key = (chat_id, meme_message_id)
+        if self._unflushed_meme(key):
+            return False
+        if await self._settled_read(self.db.get_meme_owner, chat_id, meme_message_id) is not None:
+            return False
+        if self._unflushed_meme(key):
+            return False
+        self._pending_memes[key] = (owner_tg_id, now_ts())
+        self._buffered()
+        return True
+
+    async def get_meme_owner(self, chat_id: int, meme_message_id: int) -> Optional[int]:
+        pending = self._unflushed_meme((chat_id, meme_message_id))
+        if pending is not None:
+            return pending[0]
+        return await self._settled_read(self.db.get_meme_owner, chat_id, meme_message_id)
+
+    async def _first_score(self, index: ScoredKeys, key, unflushed, scored) -> bool:
+        """True if key was never scored (and records it in index); scored is the sqlite check."""
+        if unflushed(key):
+            return False
+        seen = index.lookup(key)
+        if seen:
+            return False
+        if seen is None:
+            if await self._settled_read(scored, *key):
+                index.remember(key)
+                return False
+            if unflushed(key):
+                return False
+        index.add(key)
+        return True
+
+    async def mark_reply_scored(self, chat_id: int, reply_message_id: int) -> bool:
+        key = (chat_id, reply_message_id)
+        if not await self._first_score(self.scored_replies, key, self._unflushed_reply, self.db.reply_scored):
+            return False
+        self._pending_replies[key] = now_ts()
+        self._buffered()
+        return True
+
+    async def mark_reaction_scored(self, chat_id: int, meme_message_id: int, user_id: int) -> bool:
+        key = (chat_id, meme_message_id, user_id)
+        if not await self._first_score(self.scored_reactions, key, self._unflushed_reaction, self.db.reaction_scored):
+            return False
+        self._pending_reactions[key] = now_ts()
+        self._buffered()
+        return True
@@ -0,0 +1,120 @@
+import math
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from .metrics import DEDUP_LOOKUPS
+
+Key = Tuple[int, ...]
+_SALT = 0x9E3779B97F4A7C15
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over tuples of ints, sized for `capacity` keys at
+    `error_rate` false positives (~9.6 bits per key at 1%). No false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(1, capacity)
+        bits = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(bits / self.capacity * math.log(2)))
+        self.size = bits
+        self.count = 0
+        self._bits = bytearray((bits + 7) // 8)
+
+    # Double hashing (position i = h1 + i*h2) from two tuple hashes. The filter
+    # only lives in memory, so hash() not being stable across runs is fine.
+    def add(self, key: Key):
+        bits, size = self._bits, self.size
+        h, step = hash(key), hash((key, _SALT)) | 1
+        for _ in range(self.hashes):
+            p = h % size
+            bits[p >> 3] |= 1 << (p & 7)
+            h += step
+        self.count += 1
+
+    def __contains__(self, key: Key) -> bool:
+        bits, size = self._bits, self.size
+        h, step = hash(key), hash((key, _SALT)) | 1
+        for _ in range(self.hashes):
+            p = h % size
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+            h += step
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+class ScoredKeys:
+    """
+    In-memory dedup index of already-scored keys, e.g. (chat_id, reply_message_id)
+    or (chat_id, meme_message_id, user_id), so the scoring path only asks sqlite
+    when the answer is genuinely unknown.
+
+    Two bounded parts:
+    - Bloom filters: a key that is not in them was never scored. When the current
+      filter reaches its capacity a new one twice as large is chained on, so the
+      false-positive rate stays near error_rate as a contest grows instead of
+      the filter silently saturating.
+    - an LRU of the `recent` most recently scored keys, which answers repeats
+      (toggled reactions) exactly.
+
+    lookup() returns False (new), True (already scored) or None (the filter
+    says maybe and the key is not recent: confirm against sqlite).
+    """
+
+    def __init__(self, name: str, capacity: int = 1_000_000, error_rate: float = 0.01, recent: int = 50_000):
+        self.name = name
+        self.error_rate = error_rate
+        self.recent_max = recent
+        self._filters = [BloomFilter(capacity, error_rate)]
+        self._recent: "OrderedDict[Key, None]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return sum(f.count for f in self._filters)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(f.nbytes for f in self._filters)
+
+    def _bloom_add(self, key: Key):
+        current = self._filters[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(current.capacity * 2, self.error_rate)
+            self._filters.append(current)
+        current.add(key)
+
+    def load(self, keys: Iterable):
+        """Add every stored key (tuples from sqlite) to the filters; not marked recent."""
+        for key in keys:
+            self._bloom_add(key)
+
+    def take(self, other: "ScoredKeys"):
+        """Replace this index's contents with other's."""
+        self._filters, self._recent = other._filters, other._recent
+
+    def lookup(self, key: Key) -> Optional[bool]:
+        if key in self._recent:
+            self._recent.move_to_end(key)
+            DEDUP_LOOKUPS.inc(self.name, "recent")
+            return True
+        if not any(key in f for f in self._filters):
+            DEDUP_LOOKUPS.inc(self.name, "new")
+            return False
+        DEDUP_LOOKUPS.inc(self.name, "maybe")
+        return None
+
+    def add(self, key: Key):
+        """Record a key just scored."""
+        self._bloom_add(key)
+        self.remember(key)
+
+    def remember(self, key: Key):
+        """Mark a key known to be scored (e.g. confirmed by sqlite) as recent."""
+        self._recent[key] = None
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.recent_max:
+            self._recent.popitem(last=False)
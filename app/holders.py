@@ -0,0 +1,164 @@
+import asyncio
+import base64
+import json
+from typing import Dict, Set
+
+import aiohttp
+
+from .base58 import b58decode
+from .config import Config
+from .contests import Contest
+from .db import now_ts
+from .outbox import Outbox
+from .solana import OWNER_OFFSET, SOL_ADDR_RE, TOKEN_ACCOUNT_SIZE, TOKEN_PROGRAM_ID, SolanaClient
+from .sweep import enforce_min_hold, min_raw_for, next_check_ts, sweep_interval
+
+# how often the watched wallet set is reloaded from the DB
+WATCH_REFRESH_SECONDS = 60
+# notifications for the same wallet within this window are re-checked once
+DEBOUNCE_SECONDS = 2
+
+
+class HolderWatcher:
+    """
+    Event-driven holder enforcement over the RPC websocket.
+
+    A single programSubscribe on the SPL Token program, filtered to token
+    accounts of the contest's token mint, pushes every balance change of the mint. The
+    owner is read straight from the account bytes; changes for wallets of
+    verified + joined users are debounced and re-checked with a fresh balance,
+    everything else is dropped. The periodic sweep stays on as a slow
+    reconciliation pass (cfg.reconcile_every_seconds).
+    """
+
+    def __init__(self, outbox: Outbox, cfg: Config, contest: Contest, rpc: SolanaClient):
+        self.outbox = outbox
+        self.cfg = cfg
+        self.contest = contest
+        self.database = contest.db
+        self.rpc = rpc
+        self.watched: Dict[bytes, Dict[str, list]] = {}  # owner bytes -> {wallet: [tg_id, ...]}
+        self._due: Dict[str, asyncio.TimerHandle] = {}
+        self._rechecks: Set[asyncio.Task] = set()
+
+    async def refresh_watched(self):
+        watched = {}
+        for u in await self.database.list_verified_users(only_joined=True):
+            wallet = u["wallet"]
+            if not wallet or not SOL_ADDR_RE.match(wallet):
+                continue
+            watched.setdefault(b58decode(wallet), {}).setdefault(wallet, []).append(int(u["tg_id"]))
+        self.watched = watched
+
+    def subscribe_request(self) -> dict:
+        return {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "programSubscribe",
+            "params": [
+                TOKEN_PROGRAM_ID,
+                {
+                    "encoding": "base64",
+                    "commitment": "confirmed",
+                    "filters": [
+                        {"dataSize": TOKEN_ACCOUNT_SIZE},
+                        {"memcmp": {"offset": 0, "bytes": self.contest.spec.token_mint}},
+                    ],
+                },
+            ],
+        }
+
+    def on_notification(self, msg: dict):
+        try:
+            data_b64 = msg["params"]["result"]["value"]["account"]["data"][0]
+        except (KeyError, IndexError, TypeError):
+            return
+        data = base64.b64decode(data_b64)
+        owner = data[OWNER_OFFSET:OWNER_OFFSET + 32]
+        for wallet in self.watched.get(owner, {}):
+            if wallet not in self._due:
+                loop = asyncio.get_running_loop()
+                self._due[wallet] = loop.call_later(DEBOUNCE_SECONDS, self._start_recheck, wallet)
+
+    def _start_recheck(self, wallet: str):
+        # keep a reference until it's done (the loop only holds weak ones) so run() can cancel it
+        task = asyncio.create_task(self.recheck(wallet))
+        self._rechecks.add(task)
+        task.add_done_callback(self._recheck_done)
+
+    def _recheck_done(self, task: asyncio.Task):
+        self._rechecks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[HOLDERS {self.contest.name}] Recheck failed: {task.exception()!r}")
+
+    async def recheck(self, wallet: str):
+        self._due.pop(wallet, None)
+        tg_ids = self.watched.get(b58decode(wallet), {}).get(wallet, [])
+        if not tg_ids:
+            return
+        try:
+            decimals = await self.rpc.token_decimals(self.contest.spec.token_mint)
+            price_usd = await self.rpc.price_usd(self.contest.spec.token_mint)
+            if decimals is None or not price_usd or price_usd <= 0:
+                return
+            bal_raw = await self.rpc.get_token_balance_raw(wallet, self.contest.spec.token_mint)
+        except Exception as e:
+            # don’t punish user for RPC issues; the reconciliation sweep will catch up
+            print(f"[HOLDERS {self.contest.name}] RPC error wallet={wallet}: {e}")
+            return
+
+        min_raw = min_raw_for(self.contest.spec.min_hold_usd, price_usd, decimals)
+        ts, interval = now_ts(), sweep_interval(self.cfg)
+        await self.database.record_checks([
+            (tg_id, ts, bal_raw, next_check_ts(self.contest, interval, tg_id, ts, bal_raw, min_raw)) for tg_id in tg_ids
+        ])
+        for tg_id in tg_ids:
+            await enforce_min_hold(self.outbox, self.cfg, self.contest, tg_id, wallet, bal_raw, min_raw, decimals)
+        if bal_raw < min_raw:
+            await self.refresh_watched()
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(WATCH_REFRESH_SECONDS)
+            try:
+                await self.refresh_watched()
+            except Exception as e:
+                print(f"[HOLDERS {self.contest.name}] Refresh failed: {e}")
+
+    async def listen_once(self):
+        async with self.rpc.session.ws_connect(self.cfg.sol_ws_url, heartbeat=30) as ws:
+            await ws.send_json(self.subscribe_request())
+            print(f"[HOLDERS {self.contest.name}] Subscribed to {self.contest.spec.token_mint} token accounts")
+            async for raw in ws:
+                if raw.type != aiohttp.WSMsgType.TEXT:
+                    if raw.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+                    continue
+                msg = json.loads(raw.data)
+                if msg.get("method") == "programNotification":
+                    self.on_notification(msg)
+                elif "error" in msg:
+                    raise RuntimeError(msg["error"])
+
+    async def run(self):
+        await self.refresh_watched()
+        refresher = asyncio.create_task(self._refresh_loop())
+        backoff = 1
+        try:
+            while True:
+                try:
+                    await self.listen_once()
+                    backoff = 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"[HOLDERS {self.contest.name}] Websocket error: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+        finally:
+            refresher.cancel()
+            for handle in self._due.values():
+                handle.cancel()
+            self._due.clear()
+            for task in list(self._rechecks):
+                task.cancel()
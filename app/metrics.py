@@ -0,0 +1,186 @@
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from aiohttp import web
+
+# latency buckets in seconds, 0.5ms .. 10s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.doc = doc
+        self.label_names = labels
+        self._lock = threading.Lock()  # DB metrics are updated from executor threads
+        REGISTRY.append(self)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, doc, labels)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """A value that is set(), or read from a callback at scrape time (set_function)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, doc, labels)
+        self._values: Dict[tuple, float] = {}
+        self._functions: Dict[tuple, Callable[[], float]] = {}
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def set_function(self, fn: Callable[[], float], *labels: str):
+        with self._lock:
+            self._functions[labels] = fn
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for k, fn in functions.items():
+            try:
+                values[k] = fn()
+            except Exception:
+                continue
+        return [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(buckets)
+        self._values: Dict[tuple, list] = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[i] += 1
+            entry[-1] += value
+
+    def timed(self, label: Optional[str] = None, errors: Optional[Counter] = None):
+        """
+        Decorator observing the duration of each call (sync or async), labelled
+        with label or the function name; exceptions also count in errors.
+        """
+        def wrap(fn):
+            name = label or fn.__name__
+
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def run_async(*args, **kwargs):
+                    t = time.perf_counter()
+                    try:
+                        return await fn(*args, **kwargs)
+                    except Exception:
+                        if errors is not None:
+                            errors.inc(name)
+                        raise
+                    finally:
+                        self.observe(time.perf_counter() - t, name)
+                return run_async
+
+            @functools.wraps(fn)
+            def run(*args, **kwargs):
+                t = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    if errors is not None:
+                        errors.inc(name)
+                    raise
+                finally:
+                    self.observe(time.perf_counter() - t, name)
+            return run
+        return wrap
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        out = []
+        for k, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), entry[:-1]):
+                cumulative += count
+                le = _labels(self.label_names + ("le",), k + (str(bound),))
+                out.append(f"{self.name}_bucket{le} {cumulative}")
+            out.append(f"{self.name}_sum{_labels(self.label_names, k)} {entry[-1]}")
+            out.append(f"{self.name}_count{_labels(self.label_names, k)} {cumulative}")
+        return out
+
+
+REGISTRY = []
+
+
+def render() -> str:
+    return "\n".join(m.render() for m in REGISTRY) + "\n"
+
+
+# ---------- Metrics ----------
+SCORED = Counter("contest_scored_total", "Points awarded by the scoring handlers", ("contest", "kind"))
+UNVERIFIED = Counter("contest_unverified_total", "Users unverified by enforcement", ("contest", "reason"))
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Time to handle one Telegram update", ("update",))
+DB_SECONDS = Histogram("db_query_seconds", "Time spent in each DB method (on the executor thread)", ("method",))
+RPC_SECONDS = Histogram("rpc_request_seconds", "Solana RPC / price API latency", ("method",))
+RPC_ERRORS = Counter("rpc_errors_total", "Failed Solana RPC / price API calls", ("method",))
+SWEEP_CHECKED = Counter("sweep_checked_total", "Wallet balances checked by the sweep", ("contest",))
+SWEEP_DUE = Gauge("sweep_due_wallets", "Wallets due for a check at the last scheduler tick", ("contest",))
+SWEEP_CURSOR = Gauge("sweep_cycle_cursor_tg_id", "Checkpoint cursor of the running full sweep cycle", ("contest",))
+DEDUP_LOOKUPS = Counter("dedup_lookups_total", "Scored-key dedup index lookups by outcome (maybe = sqlite checked)", ("index", "result"))
+QUEUE_DEPTH = Gauge("queue_depth", "Items waiting in internal queues", ("queue",))
+
+
+async def start_server(host: str, port: int) -> web.AppRunner:
+    """Serve GET /metrics in the Prometheus text format; returns the runner to clean up."""
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"[METRICS] Serving http://{host}:{port}/metrics")
+    return runner
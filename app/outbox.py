@@ -0,0 +1,185 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from .metrics import QUEUE_DEPTH
+from .ratelimit import TokenBucket
+
+# lower sends first
+PRIORITY_REPLY = 0   # answers to commands: a user is waiting
+PRIORITY_NOTICE = 1  # bulk DMs (sweep notices)
+
+# Telegram's documented limits: ~1 msg/s per private chat, 20 msgs/min per group.
+# A full group burst plus a minute of refill stays at 20, so no 60s window
+# goes over it and the per-chat bucket, not a 429, is what holds a group back.
+PRIVATE_CHAT_RPS = 1.0
+GROUP_CHAT_BURST = 3
+GROUP_CHAT_RPS = (20 - GROUP_CHAT_BURST) / 60
+
+
+class Outbox:
+    """
+    Outbound message queue in front of bot.send_message.
+
+    Messages wait in a priority queue (replies before notices, FIFO within a
+    priority) and are delivered by a few background workers, each send waiting
+    on a global bucket of global_rps. Telegram's per-chat limits are applied
+    before that, with one bucket per chat shared by replies and notices: a
+    message whose chat bucket is empty is parked per chat (replies first) and
+    enters the queue once the bucket refills, so a flooded group never ties up
+    a worker. A TelegramRetryAfter, which the buckets should leave for
+    exceptional cases, pauses every worker for the requested time and re-queues
+    the message, up to max_retries times.
+
+    send() never waits for delivery: it returns a future with the sent Message
+    (or the error). reply() is send() at PRIORITY_REPLY that waits for it.
+    """
+
+    def __init__(
+        self, bot: Bot, global_rps: float = 25.0, workers: int = 4,
+        maxsize: int = 10_000, max_retries: int = 5, max_chats: int = 10_000,
+    ):
+        self.bot = bot
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._global = TokenBucket(global_rps)  # no burst: global_rps holds over any 1s window
+        self._chats: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._parked: Dict[int, list] = {}  # chat_id -> heap of items
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._n_parked = 0
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._tasks = []
+        QUEUE_DEPTH.set_function(self.__len__, "outbox")
+
+    def __len__(self) -> int:
+        return self._queue.qsize() + self._n_parked
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self, timeout: float = 5.0):
+        """Deliver what is queued (for up to timeout seconds), then stop the workers."""
+        try:
+            await asyncio.wait_for(self._drained(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[OUTBOX] Dropping {len(self)} undelivered messages")
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for timer in self._timers.values():
+            timer.cancel()
+        for parked in self._parked.values():
+            for item in parked:
+                item[5].cancel()
+        self._timers, self._parked, self._n_parked = {}, {}, 0
+        while not self._queue.empty():
+            self._queue.get_nowait()[5].cancel()
+            self._queue.task_done()
+
+    async def _drained(self):
+        while True:
+            await self._queue.join()
+            if not self._parked:
+                return
+            await asyncio.sleep(min(t.when() for t in self._timers.values()) - asyncio.get_running_loop().time())
+
+    def send(self, chat_id: int, text: str, priority: int = PRIORITY_NOTICE, **kwargs) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        # nobody awaits notices: mark errors as retrieved so they aren't logged as unhandled
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if len(self) >= self.maxsize:
+            print(f"[OUTBOX] Queue full, dropping message to chat_id={chat_id}")
+            fut.set_exception(asyncio.QueueFull())
+            return fut
+        heapq.heappush(self._parked.setdefault(chat_id, []), (priority, next(self._seq), chat_id, text, kwargs, fut, 0))
+        self._n_parked += 1
+        if chat_id not in self._timers:
+            self._release(chat_id)
+        return fut
+
+    async def reply(self, chat_id: int, text: str, **kwargs):
+        return await self.send(chat_id, text, PRIORITY_REPLY, **kwargs)
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                bucket = TokenBucket(GROUP_CHAT_RPS, burst=GROUP_CHAT_BURST)
+            else:
+                bucket = TokenBucket(PRIVATE_CHAT_RPS)
+            self._chats[chat_id] = bucket
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        self._chats.move_to_end(chat_id)
+        return bucket
+
+    def _release(self, chat_id: int):
+        """Move parked messages for chat_id into the queue while its chat bucket has tokens."""
+        self._timers.pop(chat_id, None)
+        parked = self._parked[chat_id]
+        bucket = self._chat_bucket(chat_id)
+        while parked:
+            wait = bucket.try_acquire()
+            if wait:
+                self._timers[chat_id] = asyncio.get_running_loop().call_later(wait, self._release, chat_id)
+                return
+            self._queue.put_nowait(heapq.heappop(parked))
+            self._n_parked -= 1
+        del self._parked[chat_id]
+
+    async def _wait_paused(self):
+        delay = self._paused_until - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._paused_until - time.monotonic()
+
+    async def _deliver(self, item) -> Optional[tuple]:
+        """Send one queued message (its chat token already taken); returns the item to re-queue, if any."""
+        priority, seq, chat_id, text, kwargs, fut, attempt = item
+        await self._wait_paused()
+        await self._global.acquire()
+        try:
+            msg = await self.bot.send_message(chat_id, text, **kwargs)
+        except TelegramRetryAfter as e:
+            self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            print(f"[OUTBOX] Flood limit hit, pausing {e.retry_after}s")
+            if attempt < self.max_retries:
+                return priority, seq, chat_id, text, kwargs, fut, attempt + 1
+            fut.set_exception(e)
+        except Exception as e:
+            if priority != PRIORITY_REPLY:
+                print(f"[OUTBOX] Send failed chat_id={chat_id}: {e}")
+            fut.set_exception(e)
+        else:
+            fut.set_result(msg)
+        return None
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                if item[5].cancelled():
+                    continue
+                retry = await self._deliver(item)
+                if retry is not None:
+                    # same (priority, seq): goes back to the front of its priority
+                    self._queue.put_nowait(retry)
+            except asyncio.CancelledError:
+                item[5].cancel()
+                raise
+            except Exception as e:
+                if not item[5].done():
+                    item[5].set_exception(e)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,58 @@
+import bisect
+from typing import Iterable, List, Optional, Tuple
+
+
+class RankIndex:
+    """
+    In-memory order-statistic index over joined participants.
+
+    Keys are sorted exactly like the leaderboard query
+    (points DESC, joined_at ASC, tg_id as a final tie-break), so a rank lookup
+    is a single bisect: O(log n) no matter how many people joined.
+    Updates are a bisect plus one list insert/delete (a memmove of pointers).
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[int, int, int]] = []  # sorted (-points, joined_at, tg_id)
+        self._by_id = {}                              # tg_id -> key
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, tg_id: int) -> bool:
+        return tg_id in self._by_id
+
+    def load(self, rows: Iterable):
+        """Rebuild from (tg_id, points, joined_at) rows."""
+        self._by_id = {
+            int(r["tg_id"]): (-int(r["points"] or 0), int(r["joined_at"]), int(r["tg_id"]))
+            for r in rows
+        }
+        self._keys = sorted(self._by_id.values())
+
+    def upsert(self, tg_id: int, points: int, joined_at: int):
+        self.remove(tg_id)
+        key = (-points, joined_at, tg_id)
+        bisect.insort(self._keys, key)
+        self._by_id[tg_id] = key
+
+    def remove(self, tg_id: int):
+        key = self._by_id.pop(tg_id, None)
+        if key is not None:
+            del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def add(self, tg_id: int, delta: int):
+        key = self._by_id.get(tg_id)
+        if key is not None:
+            self.upsert(tg_id, -key[0] + delta, key[1])
+
+    def rank(self, tg_id: int) -> Optional[Tuple[int, int]]:
+        """(1-based position, points) or None if not joined."""
+        key = self._by_id.get(tg_id)
+        if key is None:
+            return None
+        return (bisect.bisect_left(self._keys, key) + 1, -key[0])
+
+    def top(self, k: int) -> List[Tuple[int, int]]:
+        """First k participants as (tg_id, points), in leaderboard order."""
+        return [(key[2], -key[0]) for key in self._keys[:k]]
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class TokenBucket:
+    """
+    Async token bucket: acquire() waits until a token is available.
+    rate is tokens per second, burst is the bucket size.
+    """
+
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def try_acquire(self) -> float:
+        """Take a token without waiting: 0.0 if taken, else seconds until one is available."""
+        self._refill()
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        self._tokens -= 1
+        return 0.0
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    Token bucket that backs off when the upstream says "too many requests"
+    and ramps back up once it stops (AIMD):
+    - on_rate_limited(): halve the rate (never below min_rps)
+    - on_success(): add max_rps * step to the rate, once cooldown seconds have
+      passed since the last rate-limit signal
+    """
+
+    def __init__(self, max_rps: float, min_rps: float = 0.5, step: float = 0.05, cooldown: float = 5.0):
+        super().__init__(max_rps, burst=max_rps)
+        self.max_rps = max_rps
+        self.min_rps = min(min_rps, max_rps)
+        self.step = step
+        self.cooldown = cooldown
+        self._limited_at = 0.0
+
+    def on_rate_limited(self):
+        self.rate = max(self.min_rps, self.rate / 2)
+        self._tokens = min(self._tokens, 0)
+        self._limited_at = time.monotonic()
+
+    def on_success(self):
+        if self.rate < self.max_rps and time.monotonic() - self._limited_at >= self.cooldown:
+            self.rate = min(self.max_rps, self.rate + self.max_rps * self.step)
+
+
+class Cooldown:
+    """
+    In-memory per-key cooldown (e.g. per Telegram user), bounded as an LRU so
+    a flood of distinct keys can't grow it without limit.
+    """
+
+    def __init__(self, seconds: float, maxsize: int = 10_000):
+        self.seconds = seconds
+        self.maxsize = maxsize
+        self._last: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def remaining(self, key: Hashable) -> float:
+        """0 if key may proceed now, otherwise the seconds left to wait."""
+        last = self._last.get(key)
+        if last is None:
+            return 0.0
+        return max(0.0, self.seconds - (time.monotonic() - last))
+
+    def start(self, key: Hashable):
+        """Start key's cooldown, e.g. once the rate-limited work has been done."""
+        self._last[key] = time.monotonic()
+        self._last.move_to_end(key)
+        while len(self._last) > self.maxsize:
+            self._last.popitem(last=False)
@@ -1,71 +1,315 @@
 import aiohttp
+import base64
+import json
 import re
-from typing import Any, Dict, Optional
+import struct
+from typing import Any, Dict, List, Optional, Union
+
+from .cache import AsyncTTLCache
+from .metrics import RPC_ERRORS, RPC_SECONDS
 
 SOL_ADDR_RE = re.compile(r"^[1-9A-HJ-NP-Za-km-z]{32,44}$")
 
+TOKEN_PROGRAM_ID = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+# SPL token account layout: mint[0:32] owner[32:64] amount[64:72], 165 bytes total
+TOKEN_ACCOUNT_SIZE = 165
+OWNER_OFFSET = 32
+AMOUNT_OFFSET = 64
+
+# base64 payload of one account in a getProgramAccounts / getTokenAccountsByOwner response
+_B64_DATA_RE = re.compile(rb'"data"\s*:\s*\[\s*"([A-Za-z0-9+/=]*)"')
+
+# JSON-RPC error codes RPC providers use for "slow down"
+RATE_LIMIT_CODES = {429, -32005}
+
+
+class RateLimitError(RuntimeError):
+    """The RPC answered HTTP 429 or a JSON-RPC rate-limit error."""
+
+
+def rpc_error(err: Any) -> RuntimeError:
+    code = err.get("code") if isinstance(err, dict) else None
+    message = str(err.get("message", "")) if isinstance(err, dict) else str(err)
+    if code in RATE_LIMIT_CODES or "rate limit" in message.lower():
+        return RateLimitError(err)
+    return RuntimeError(err)
+
 async def sol_rpc(session: aiohttp.ClientSession, rpc_url: str, method: str, params: list) -> Dict[str, Any]:
     payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
-    async with session.post(rpc_url, json=payload, timeout=20) as resp:
+    async with session.post(rpc_url, json=payload) as resp:
+        if resp.status == 429:
+            raise RateLimitError(f"HTTP 429 from RPC ({method})")
         resp.raise_for_status()
         return await resp.json()
 
-async def get_token_balance_raw(rpc_url: str, owner: str, mint: str) -> int:
+async def sol_rpc_raw(session: aiohttp.ClientSession, rpc_url: str, method: str, params: list) -> bytes:
+    """Like sol_rpc but returns the undecoded response body."""
+    payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+    async with session.post(rpc_url, json=payload) as resp:
+        if resp.status == 429:
+            raise RateLimitError(f"HTTP 429 from RPC ({method})")
+        resp.raise_for_status()
+        return await resp.read()
+
+async def sol_rpc_batch(session: aiohttp.ClientSession, rpc_url: str, calls: List[tuple]) -> List[Dict[str, Any]]:
     """
-    Total token amount in raw units across token accounts for owner filtered by mint.
+    One JSON-RPC batch POST for [(method, params), ...].
+    Returns one response object per call, in call order (missing ones become errors).
     """
-    async with aiohttp.ClientSession() as session:
-        res = await sol_rpc(session, rpc_url, "getTokenAccountsByOwner", [
-            owner,
-            {"mint": mint},
-            {"encoding": "jsonParsed"}
-        ])
-        if "error" in res:
-            raise RuntimeError(res["error"])
+    payload = [
+        {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+        for i, (method, params) in enumerate(calls)
+    ]
+    async with session.post(rpc_url, json=payload) as resp:
+        if resp.status == 429:
+            raise RateLimitError(f"HTTP 429 from RPC (batch of {len(calls)})")
+        resp.raise_for_status()
+        body = await resp.json()
 
-        value = res.get("result", {}).get("value", [])
-        total = 0
-        for acc in value:
-            try:
-                info = acc["account"]["data"]["parsed"]["info"]["tokenAmount"]
-                amt = int(info["amount"])
-                total += amt
-            except Exception:
-                continue
-        return total
-
-async def get_token_decimals(rpc_url: str, mint: str) -> Optional[int]:
-    async with aiohttp.ClientSession() as session:
-        res = await sol_rpc(session, rpc_url, "getTokenSupply", [mint])
-    if "error" in res:
-        return None
-    try:
-        return int(res["result"]["value"]["decimals"])
-    except Exception:
-        return None
-
-async def get_price_usd_dexscreener(token_mint: str) -> Optional[float]:
+    if isinstance(body, dict):
+        # some RPCs answer a rejected batch with a single error object
+        return [body for _ in calls]
+
+    by_id = {r.get("id"): r for r in body if isinstance(r, dict)}
+    return [by_id.get(i, {"error": "missing response"}) for i in range(len(calls))]
+
+def sum_token_amounts(result: Dict[str, Any]) -> int:
+    """Sum raw amounts from a jsonParsed getTokenAccountsByOwner result."""
+    total = 0
+    for acc in result.get("value", []):
+        try:
+            info = acc["account"]["data"]["parsed"]["info"]["tokenAmount"]
+            amt = int(info["amount"])
+            total += amt
+        except Exception:
+            continue
+    return total
+
+def sum_base64_amounts(result: Dict[str, Any]) -> int:
+    """Sum raw amounts from a base64 getTokenAccountsByOwner result sliced to the amount field."""
+    total = 0
+    for acc in result.get("value", []):
+        try:
+            total += struct.unpack_from("<Q", base64.b64decode(acc["account"]["data"][0]))[0]
+        except Exception:
+            continue
+    return total
+
+def scan_base64_amounts(body: bytes) -> int:
     """
-    Fetch USD price from Dexscreener. Chooses the highest-liquidity pair.
+    Same as sum_base64_amounts, but straight from the raw response body:
+    the base64 strings are found by regex and decoded as little-endian u64,
+    without building a JSON tree at all.
     """
-    url = f"https://api.dexscreener.com/token-pairs/v1/solana/{token_mint}"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, timeout=20) as resp:
+    total = 0
+    for match in _B64_DATA_RE.finditer(body):
+        data = base64.b64decode(match.group(1))
+        if len(data) >= 8:
+            total += struct.unpack_from("<Q", data)[0]
+    return total
+
+
+class SolanaClient:
+    """
+    Shared HTTP client for the Solana RPC and Dexscreener.
+    main.py creates one at startup and closes it at shutdown, so every
+    /verify and sweep request reuses pooled keep-alive connections instead of
+    paying a new TCP+TLS handshake.
+
+    token_decimals() / price_usd() are the cached, coalesced front for
+    get_token_decimals() / get_price_usd_dexscreener(): decimals are kept
+    forever, price for price_ttl_seconds (a stale price is served if a refresh fails).
+    token_balance_raw() does the same for single-wallet lookups (/verify) with a
+    short balance_ttl_seconds and no stale fallback.
+
+    balance_encoding picks how getTokenAccountsByOwner is requested:
+    "jsonParsed" (full parsed accounts) or "base64" (a dataSlice of just the
+    8-byte amount, decoded with struct).
+    """
+
+    def __init__(
+        self,
+        rpc_url: str,
+        limit_per_host: int = 20,
+        dns_cache_seconds: int = 300,
+        timeout_seconds: float = 20,
+        price_ttl_seconds: float = 60,
+        balance_ttl_seconds: float = 5,
+        balance_encoding: str = "jsonParsed",
+    ):
+        self.rpc_url = rpc_url
+        self.balance_encoding = balance_encoding
+        self.limit_per_host = limit_per_host
+        self.dns_cache_seconds = dns_cache_seconds
+        self.timeout_seconds = timeout_seconds
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.decimals_cache = AsyncTTLCache(ttl=None)
+        self.price_cache = AsyncTTLCache(ttl=price_ttl_seconds)
+        self.balance_cache = AsyncTTLCache(ttl=balance_ttl_seconds, maxsize=4096, serve_stale=False)
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_seconds,
+            keepalive_timeout=60,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+        )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def rpc(self, method: str, params: list) -> Dict[str, Any]:
+        return await sol_rpc(self.session, self.rpc_url, method, params)
+
+    def _balance_params(self, owner: str, mint: str) -> list:
+        if self.balance_encoding == "base64":
+            encoding = {"encoding": "base64", "dataSlice": {"offset": AMOUNT_OFFSET, "length": 8}}
+        else:
+            encoding = {"encoding": "jsonParsed"}
+        return [owner, {"mint": mint}, encoding]
+
+    def _sum_amounts(self, result: Dict[str, Any]) -> int:
+        if self.balance_encoding == "base64":
+            return sum_base64_amounts(result)
+        return sum_token_amounts(result)
+
+    @RPC_SECONDS.timed(errors=RPC_ERRORS)
+    async def get_token_balance_raw(self, owner: str, mint: str) -> int:
+        """
+        Total token amount in raw units across token accounts for owner filtered by mint.
+        """
+        params = self._balance_params(owner, mint)
+        if self.balance_encoding == "base64":
+            body = await sol_rpc_raw(self.session, self.rpc_url, "getTokenAccountsByOwner", params)
+            if b'"error"' in body:
+                raise rpc_error(json.loads(body).get("error"))
+            return scan_base64_amounts(body)
+
+        res = await self.rpc("getTokenAccountsByOwner", params)
+        if "error" in res:
+            raise rpc_error(res["error"])
+        return sum_token_amounts(res.get("result", {}))
+
+    @RPC_SECONDS.timed(errors=RPC_ERRORS)
+    async def get_token_balances_raw(self, owners: List[str], mint: str) -> Dict[str, Union[int, Exception]]:
+        """
+        Balances for many owners in one JSON-RPC batch POST.
+        Per-owner failures come back as the Exception for that owner (RateLimitError
+        for rate-limit errors); if the whole POST fails every owner maps to that error.
+        """
+        calls = [("getTokenAccountsByOwner", self._balance_params(owner, mint)) for owner in owners]
+        try:
+            responses = await sol_rpc_batch(self.session, self.rpc_url, calls)
+        except Exception as e:
+            RPC_ERRORS.inc("get_token_balances_raw")
+            return {owner: e for owner in owners}
+
+        out: Dict[str, Union[int, Exception]] = {}
+        for owner, res in zip(owners, responses):
+            if "error" in res:
+                RPC_ERRORS.inc("getTokenAccountsByOwner")
+                out[owner] = rpc_error(res["error"])
+            else:
+                out[owner] = self._sum_amounts(res.get("result", {}))
+        return out
+
+    async def token_balance_raw(self, owner: str, mint: str) -> int:
+        return await self.balance_cache.get((owner, mint), lambda: self.get_token_balance_raw(owner, mint))
+
+    async def token_decimals(self, mint: str) -> Optional[int]:
+        return await self.decimals_cache.get(mint, lambda: self.get_token_decimals(mint))
+
+    async def price_usd(self, token_mint: str) -> Optional[float]:
+        return await self.price_cache.get(token_mint, lambda: self.get_price_usd_dexscreener(token_mint))
+
+    @RPC_SECONDS.timed(errors=RPC_ERRORS)
+    async def get_mint_holder_balances(self, mint: str) -> Dict[bytes, int]:
+        """
+        Every holder of mint in one getProgramAccounts call: {owner pubkey bytes: raw total}.
+        Only owner + amount (40 bytes per account) are requested via dataSlice, and
+        the response is scanned chunk by chunk instead of being loaded as one JSON
+        tree, so memory stays proportional to the number of distinct owners.
+        A big mint's response can take longer than the session's total timeout to
+        stream, so only a stalled read (no bytes for timeout_seconds) aborts it.
+        """
+        params = [
+            TOKEN_PROGRAM_ID,
+            {
+                "encoding": "base64",
+                "dataSlice": {"offset": OWNER_OFFSET, "length": 40},
+                "filters": [
+                    {"dataSize": TOKEN_ACCOUNT_SIZE},
+                    {"memcmp": {"offset": 0, "bytes": mint}},
+                ],
+            },
+        ]
+        payload = {"jsonrpc": "2.0", "id": 1, "method": "getProgramAccounts", "params": params}
+        holders: Dict[bytes, int] = {}
+        body = b""  # the whole response until a "result" shows up, for the error path
+        has_result = False
+        buf = b""
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=self.timeout_seconds)
+        async with self.session.post(self.rpc_url, json=payload, timeout=timeout) as resp:
+            if resp.status == 429:
+                raise RateLimitError("HTTP 429 from RPC (getProgramAccounts)")
+            resp.raise_for_status()
+            async for chunk in resp.content.iter_chunked(1 << 16):
+                if not has_result:
+                    body += chunk
+                    has_result = b'"result"' in body
+                    if has_result:
+                        body = b""
+                buf += chunk
+                end = 0
+                for match in _B64_DATA_RE.finditer(buf):
+                    data = memoryview(base64.b64decode(match.group(1)))
+                    owner = data[:32].tobytes()
+                    holders[owner] = holders.get(owner, 0) + struct.unpack_from("<Q", data, 32)[0]
+                    end = match.end()
+                # keep only a tail that may hold a partial match
+                buf = buf[max(end, len(buf) - 256):]
+
+        if not has_result:
+            raise rpc_error(json.loads(body).get("error"))
+        return holders
+
+    @RPC_SECONDS.timed(errors=RPC_ERRORS)
+    async def get_token_decimals(self, mint: str) -> Optional[int]:
+        res = await self.rpc("getTokenSupply", [mint])
+        if "error" in res:
+            return None
+        try:
+            return int(res["result"]["value"]["decimals"])
+        except Exception:
+            return None
+
+    @RPC_SECONDS.timed(errors=RPC_ERRORS)
+    async def get_price_usd_dexscreener(self, token_mint: str) -> Optional[float]:
+        """
+        Fetch USD price from Dexscreener. Chooses the highest-liquidity pair.
+        """
+        url = f"https://api.dexscreener.com/token-pairs/v1/solana/{token_mint}"
+        async with self.session.get(url) as resp:
             resp.raise_for_status()
             pairs = await resp.json()
 
-    if not isinstance(pairs, list) or not pairs:
-        return None
+        if not isinstance(pairs, list) or not pairs:
+            return None
+
+        def liq_usd(p):
+            try:
+                return float(p.get("liquidity", {}).get("usd") or 0)
+            except Exception:
+                return 0.0
 
-    def liq_usd(p):
+        best = max(pairs, key=liq_usd)
         try:
-            return float(p.get("liquidity", {}).get("usd") or 0)
+            price = best.get("priceUsd")
+            return float(price) if price is not None else None
         except Exception:
-            return 0.0
-
-    best = max(pairs, key=liq_usd)
-    try:
-        price = best.get("priceUsd")
-        return float(price) if price is not None else None
-    except Exception:
-        return None
+            return None
@@ -1,77 +1,383 @@
 import asyncio
 import math
-from aiogram import Bot
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Union
 
-from .db import DB
-from .config import Config
-from .solana import SOL_ADDR_RE, get_token_balance_raw, get_token_decimals, get_price_usd_dexscreener
+from .base58 import b58decode
+from .db import now_ts
+from .config import Config, ContestSpec
+from .contests import Contest
+from .metrics import SWEEP_CHECKED, SWEEP_CURSOR, SWEEP_DUE, UNVERIFIED
+from .outbox import Outbox
+from .ratelimit import AdaptiveRateLimiter
+from .solana import SOL_ADDR_RE, RateLimitError, SolanaClient
 
-async def sweep_task(bot: Bot, cfg: Config, database: DB):
+# how many times a rate-limited wallet is re-queued within one cycle
+MAX_RATE_LIMIT_RETRIES = 5
+# users per checkpointed page of a full cycle
+CHECKPOINT_USERS = 1000
+# after a price move of cfg.reprioritize_price_move, the continuous sweep's
+# budget is PRICE_MOVE_BOOST times the usual for the next PRICE_MOVE_TICKS ticks
+PRICE_MOVE_BOOST = 4
+PRICE_MOVE_TICKS = 8
+
+
+@dataclass
+class SweepStats:
+    checked: int = 0
+    requests: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    def summary(self) -> str:
+        duration = time.monotonic() - self.started
+        rps = self.requests / duration if duration > 0 else 0.0
+        return (
+            f"checked={self.checked} requests={self.requests} rps={rps:.2f} "
+            f"errors={self.errors} rate_limited={self.rate_limited} duration={duration:.1f}s"
+        )
+
+
+async def fetch_balances(
+    rpc: SolanaClient,
+    cfg: Config,
+    limiter: AdaptiveRateLimiter,
+    mint: str,
+    wallets: List[str],
+    on_batch: Callable[[Dict[str, Union[int, Exception]]], Awaitable[None]],
+    stats: SweepStats,
+):
     """
-    Periodic enforcement (C):
-    - fetch decimals + price once per cycle
-    - check verified+joined users
-    - if wallet < $MIN_HOLD_USD worth of token => unverify + (optional) kick from contest
+    Concurrent balance fetch: cfg.sweep_concurrency workers pull batches of
+    cfg.rpc_batch_size wallets, so at most that many requests are in flight, and
+    every request waits on the shared limiter. Rate-limited wallets slow the
+    limiter down and are re-queued; everything else is handed to on_batch().
     """
-    await asyncio.sleep(10)
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(0, len(wallets), cfg.rpc_batch_size):
+        queue.put_nowait((wallets[i:i + cfg.rpc_batch_size], 0))
 
-    while True:
-        try:
-            decimals = await get_token_decimals(cfg.sol_rpc_url, cfg.token_mint)
-            price_usd = await get_price_usd_dexscreener(cfg.token_mint)
+    async def worker():
+        while not queue.empty():
+            batch, attempt = queue.get_nowait()
+            await limiter.acquire()
+            stats.requests += 1
+            balances = await rpc.get_token_balances_raw(batch, mint)
 
-            if decimals is None or not price_usd or price_usd <= 0:
-                # skip this cycle if we can’t determine threshold
-                print("[SWEEP] Skipping: missing decimals or price")
-                await asyncio.sleep(cfg.sweep_every_seconds)
-                continue
+            limited = [w for w, b in balances.items() if isinstance(b, RateLimitError)]
+            if limited:
+                stats.rate_limited += len(limited)
+                limiter.on_rate_limited()
+                if attempt < MAX_RATE_LIMIT_RETRIES:
+                    queue.put_nowait((limited, attempt + 1))
+                    for w in limited:
+                        del balances[w]
+            else:
+                limiter.on_success()
 
-            min_tokens = cfg.min_hold_usd / price_usd
-            min_raw = math.ceil(min_tokens * (10 ** decimals))
+            stats.checked += sum(1 for b in balances.values() if not isinstance(b, Exception))
+            stats.errors += sum(1 for b in balances.values() if isinstance(b, Exception))
+            if balances:
+                await on_batch(balances)
 
-            users = database.list_verified_users(only_joined=True)
-            print(f"[SWEEP] Checking {len(users)} users. min_raw={min_raw}")
+    # the first failure (e.g. on_batch can't store) ends the fetch: the other
+    # workers are cancelled instead of sending requests and notices for a pass
+    # the caller is about to give up on
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, cfg.sweep_concurrency))]
+    try:
+        done, _ = await asyncio.wait(workers, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for t in workers:
+            t.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    for t in done:
+        if t.exception() is not None:
+            raise t.exception()
 
-            for u in users:
-                tg_id = int(u["tg_id"])
-                wallet = u["wallet"]
 
-                if not wallet or not SOL_ADDR_RE.match(wallet):
-                    database.unverify_and_optionally_kick(tg_id, cfg.kick_on_fail)
-                    continue
+def min_raw_for(min_hold_usd: float, price_usd: float, decimals: int) -> int:
+    """Minimum balance in raw token units worth min_hold_usd at price_usd."""
+    min_tokens = min_hold_usd / price_usd
+    return math.ceil(min_tokens * (10 ** decimals))
+
+
+async def snapshot_balances(
+    snapshot: Dict[bytes, int],
+    wallets: List[str],
+    on_batch: Callable[[Dict[str, Union[int, Exception]]], Awaitable[None]],
+    stats: SweepStats,
+):
+    """
+    Snapshot mode: one getProgramAccounts call (rpc.get_mint_holder_balances)
+    returns every holder of the mint, which is then joined in memory against the
+    wallets to check. Owners missing from the snapshot hold no token accounts
+    for the mint, i.e. balance 0.
+    """
+    balances = {w: snapshot.get(b58decode(w), 0) for w in wallets}
+    stats.checked += len(balances)
+    await on_batch(balances)
+
+
+async def enforce_min_hold(
+    outbox: Outbox, cfg: Config, contest: Contest,
+    tg_id: int, wallet: str, bal_raw: int, min_raw: int, decimals: int,
+):
+    """Unverify (+ optional kick) and queue a DM to the user if bal_raw is below min_raw."""
+    if bal_raw >= min_raw:
+        return
+
+    await contest.db.unverify_and_optionally_kick(tg_id, cfg.kick_on_fail)
+    UNVERIFIED.inc(contest.name, "below_min_hold")
+
+    # DM notice (queued, so a large sweep never waits on Telegram's flood limits;
+    # failures, e.g. the user blocked the bot, are logged by the outbox)
+    ui_bal = bal_raw / (10 ** decimals)
+    ui_min = min_raw / (10 ** decimals)
+    outbox.send(
+        tg_id,
+        (
+            "⚠️ Contest verification removed.\n\n"
+            f"Minimum: **${contest.spec.min_hold_usd:.2f}** (≈ **{ui_min:.6f}** tokens)\n"
+            f"Your balance: ≈ **{ui_bal:.6f}** tokens\n\n"
+            "Buy/hold above the minimum and re-verify:\n"
+            f"`/verify {wallet}`"
+        ),
+        parse_mode="Markdown",
+    )
+
+
+def check_interval(base: float, bal_raw, min_raw: int, recently_scored: bool) -> float:
+    """
+    Seconds between checks of one wallet for the continuous scheduler.
+    Never checked or below the minimum: now. Otherwise it scales with headroom
+    (last balance / minimum): 1.25x -> base/8, 3x -> base, >= 9x -> 4 * base.
+    Wallets that scored recently are checked twice as often.
+    """
+    if bal_raw is None or bal_raw < min_raw:
+        return 0.0
+    ratio = bal_raw / max(min_raw, 1)
+    interval = base * min(4.0, max(0.125, (ratio - 1) / 2))
+    if recently_scored:
+        interval /= 2
+    return interval
+
+
+def next_check_ts(contest: Contest, interval: float, tg_id: int, checked_ts: int, bal_raw, min_raw: int) -> int:
+    """When a wallet checked at checked_ts is next due (stored with the check, see DB.due_for_check)."""
+    scored = contest.db.last_scored.get(tg_id, 0) >= checked_ts - interval
+    return checked_ts + int(check_interval(interval, bal_raw, min_raw, scored))
+
+
+def sweep_interval(cfg: Config) -> int:
+    """Seconds between full passes; with HolderWatcher on, the sweep only reconciles."""
+    return cfg.reconcile_every_seconds if cfg.holder_ws_enabled else cfg.sweep_every_seconds
+
+
+async def _threshold(rpc: SolanaClient, spec: ContestSpec):
+    """(decimals, price_usd, min_raw) or None if the threshold can't be determined."""
+    decimals = await rpc.token_decimals(spec.token_mint)
+    price_usd = await rpc.price_usd(spec.token_mint)
+    if decimals is None or not price_usd or price_usd <= 0:
+        return None
+    return decimals, price_usd, min_raw_for(spec.min_hold_usd, price_usd, decimals)
+
+
+async def _valid_holders(cfg: Config, contest: Contest, users) -> Dict[str, List[int]]:
+    """wallet -> [tg_id, ...]; users with a malformed wallet are unverified on the spot."""
+    holders: Dict[str, List[int]] = {}
+    for u in users:
+        tg_id = int(u["tg_id"])
+        wallet = u["wallet"]
+
+        if not wallet or not SOL_ADDR_RE.match(wallet):
+            await contest.db.unverify_and_optionally_kick(tg_id, cfg.kick_on_fail)
+            UNVERIFIED.inc(contest.name, "invalid_wallet")
+            continue
+        holders.setdefault(wallet, []).append(tg_id)
+    return holders
+
 
-                try:
-                    bal_raw = await get_token_balance_raw(cfg.sol_rpc_url, wallet, cfg.token_mint)
-                except Exception as e:
+def _enforcer(
+    outbox: Outbox, cfg: Config, contest: Contest, holders, min_raw: int, decimals: int, interval: float, checked=None,
+):
+    """
+    on_batch callback: enforce the minimum and record each result with its next
+    check, either right away or, if a checked list is given, by appending to it
+    for the caller to store.
+    """
+    async def on_batch(balances):
+        batch = [] if checked is None else checked
+        for wallet, bal_raw in balances.items():
+            for tg_id in holders[wallet]:
+                if isinstance(bal_raw, Exception):
                     # don’t punish user for RPC issues
-                    print(f"[SWEEP] RPC error tg_id={tg_id}: {e}")
-                    await asyncio.sleep(0.25)
+                    print(f"[SWEEP {contest.name}] RPC error tg_id={tg_id}: {bal_raw}")
                     continue
+                ts = now_ts()
+                batch.append((tg_id, ts, bal_raw, next_check_ts(contest, interval, tg_id, ts, bal_raw, min_raw)))
+                SWEEP_CHECKED.inc(contest.name)
+                await enforce_min_hold(outbox, cfg, contest, tg_id, wallet, bal_raw, min_raw, decimals)
+        if checked is None and batch:
+            await contest.db.record_checks(batch)
+    return on_batch
+
+
+async def sweep_cycle(
+    outbox: Outbox, cfg: Config, contest: Contest, rpc: SolanaClient, limiter: AdaptiveRateLimiter, interval: float,
+):
+    """
+    One full pass over every verified + joined user, in tg_id order and
+    checkpointed in sweep_state: each page of CHECKPOINT_USERS is stored together
+    with the cursor, so a restart resumes after the last stored page with the
+    same price/decimals/min_raw. A cycle older than interval is abandoned.
+    """
+    database = contest.db
+    state = await database.sweep_checkpoint()
+    if state["cycle_id"] and state["finished_ts"] is None and now_ts() - state["started_ts"] < interval:
+        cycle_id, cursor = state["cycle_id"], state["cursor_tg_id"]
+        decimals, min_raw = state["decimals"], int(state["min_raw"])
+        print(f"[SWEEP {contest.name}] Resuming cycle {cycle_id} after tg_id={cursor}. min_raw={min_raw}")
+    else:
+        threshold = await _threshold(rpc, contest.spec)
+        if threshold is None:
+            # skip this cycle if we can’t determine threshold
+            print(f"[SWEEP {contest.name}] Skipping: missing decimals or price")
+            return
+        decimals, price_usd, min_raw = threshold
+        cycle_id, cursor = await database.start_sweep_cycle(price_usd, decimals, min_raw), 0
+        print(f"[SWEEP {contest.name}] Starting cycle {cycle_id} ({cfg.sweep_mode} mode). min_raw={min_raw}")
+
+    stats = SweepStats()
+    snapshot = None
+    if cfg.sweep_mode == "snapshot":
+        stats.requests += 1
+        snapshot = await rpc.get_mint_holder_balances(contest.spec.token_mint)
+
+    while True:
+        users = await database.list_verified_page(cursor, CHECKPOINT_USERS)
+        if not users:
+            break
+        holders = await _valid_holders(cfg, contest, users)
+        checked = []
+        on_batch = _enforcer(outbox, cfg, contest, holders, min_raw, decimals, interval, checked)
+        if snapshot is not None:
+            await snapshot_balances(snapshot, list(holders), on_batch, stats)
+        else:
+            await fetch_balances(rpc, cfg, limiter, contest.spec.token_mint, list(holders), on_batch, stats)
+        cursor = int(users[-1]["tg_id"])
+        await database.save_sweep_progress(cycle_id, cursor, checked)
+        SWEEP_CURSOR.set(cursor, contest.name)
+
+    await database.finish_sweep_cycle(cycle_id)
+    print(f"[SWEEP {contest.name}] Done: cycle {cycle_id} {stats.summary()} limiter_rps={limiter.rate:.2f}")
+
+
+async def _reschedule(contest: Contest, interval: float, min_raw: int):
+    """Recompute every wallet's next check against a new min_raw (after a price move)."""
+    database = contest.db
+    schedule = []
+    for u in await database.list_verified_users(only_joined=True):
+        tg_id = int(u["tg_id"])
+        checked_ts = u["last_checked_ts"] or 0
+        schedule.append((tg_id, next_check_ts(contest, interval, tg_id, checked_ts, u["last_balance_raw"], min_raw)))
+    await database.reschedule_checks(schedule)
+
+
+async def continuous_sweep(
+    outbox: Outbox, cfg: Config, contest: Contest, rpc: SolanaClient, limiter: AdaptiveRateLimiter, interval: float,
+):
+    """
+    Incremental scheduler for wallet mode. Every check stores when the wallet
+    is next due (check_interval() after it), and every cfg.sweep_tick_seconds
+    the most overdue wallets are picked from that index, up to a budget that
+    spreads one interval's worth of checks evenly over the interval. A price
+    move of cfg.reprioritize_price_move or more recomputes every wallet's next
+    check against the new minimum (the only full pass) and raises the budget
+    PRICE_MOVE_BOOST-fold for PRICE_MOVE_TICKS ticks, so wallets the new price
+    pushed toward (or under) the minimum are re-checked soon without one
+    unbounded tick.
+    """
+    database = contest.db
+    last_price = None
+    boosted_ticks = 0
+    while True:
+        try:
+            threshold = await _threshold(rpc, contest.spec)
+            if threshold is None:
+                print(f"[SWEEP {contest.name}] Skipping tick: missing decimals or price")
+            else:
+                decimals, price_usd, min_raw = threshold
+
+                moved = last_price is not None and abs(price_usd / last_price - 1) >= cfg.reprioritize_price_move
+                if moved:
+                    print(f"[SWEEP {contest.name}] Price moved {last_price:.10g} -> {price_usd:.10g}, re-prioritizing all wallets")
+                    await _reschedule(contest, interval, min_raw)
+                    boosted_ticks = PRICE_MOVE_TICKS
+                if last_price is None or moved:
+                    last_price = price_usd
+
+                budget = max(cfg.rpc_batch_size, math.ceil(2 * len(database.eligible) * cfg.sweep_tick_seconds / interval))
+                if boosted_ticks:
+                    budget *= PRICE_MOVE_BOOST
+                    boosted_ticks -= 1
+                now = now_ts()
+                picked = await database.due_for_check(now, budget)
+                due = await database.count_due(now)
+                SWEEP_DUE.set(due, contest.name)
+                if picked:
+                    holders = await _valid_holders(cfg, contest, picked)
+                    on_batch = _enforcer(outbox, cfg, contest, holders, min_raw, decimals, interval)
+                    stats = SweepStats()
+                    await fetch_balances(rpc, cfg, limiter, contest.spec.token_mint, list(holders), on_batch, stats)
+                    print(f"[SWEEP {contest.name}] Tick: due={due} budget={budget} {stats.summary()} limiter_rps={limiter.rate:.2f}")
+        except Exception as e:
+            print(f"[SWEEP {contest.name}] Fatal sweep error: {e}")
+
+        await asyncio.sleep(cfg.sweep_tick_seconds)
+
+
+async def sweep_task(
+    outbox: Outbox, cfg: Config, contest: Contest, rpc: SolanaClient, limiter: Optional[AdaptiveRateLimiter] = None,
+):
+    """
+    Periodic enforcement (C):
+    - fetch decimals + price (cached on the client)
+    - check verified+joined users, either
+      "wallet" mode: cfg.rpc_batch_size wallets per JSON-RPC batch, fetched
+      concurrently under an adaptive rate limit (see fetch_balances), or
+      "snapshot" mode: one getProgramAccounts for the whole mint (see snapshot_balances)
+    - if wallet < $MIN_HOLD_USD worth of token => unverify + (optional) kick from contest
+    Wallet mode with cfg.sweep_schedule == "continuous" runs the prioritized
+    scheduler (continuous_sweep), which resumes from the per-user
+    next_check_ts after a restart; otherwise checkpointed full cycles
+    (sweep_cycle) run every interval.
+    With HolderWatcher enabled the interval is cfg.reconcile_every_seconds.
+    One task runs per contest (its own mint, price and decimals); pass them a
+    shared limiter so together they stay under cfg.sweep_max_rps.
+    """
+    database = contest.db
+    interval = sweep_interval(cfg)
+    limiter = limiter or AdaptiveRateLimiter(cfg.sweep_max_rps)
+    await asyncio.sleep(10)
+
+    if cfg.sweep_mode == "wallet" and cfg.sweep_schedule == "continuous":
+        await continuous_sweep(outbox, cfg, contest, rpc, limiter, interval)
+        return
 
-                if bal_raw < min_raw:
-                    database.unverify_and_optionally_kick(tg_id, cfg.kick_on_fail)
-
-                    # DM notice (optional; will fail if user blocked bot)
-                    try:
-                        ui_bal = bal_raw / (10 ** decimals)
-                        ui_min = min_raw / (10 ** decimals)
-                        await bot.send_message(
-                            tg_id,
-                            (
-                                "⚠️ Contest verification removed.\n\n"
-                                f"Minimum: **${cfg.min_hold_usd:.2f}** (≈ **{ui_min:.6f}** tokens)\n"
-                                f"Your balance: ≈ **{ui_bal:.6f}** tokens\n\n"
-                                "Buy/hold above the minimum and re-verify:\n"
-                                f"`/verify {wallet}`"
-                            ),
-                            parse_mode="Markdown",
-                        )
-                    except Exception as dm_err:
-                        print(f"[SWEEP] DM failed tg_id={tg_id}: {dm_err}")
-
-                await asyncio.sleep(0.25)  # throttle per-wallet
+    # a cycle that finished shortly before a restart isn't re-run straight away
+    state = await database.sweep_checkpoint()
+    if state["finished_ts"] is not None:
+        wait = state["started_ts"] + interval - now_ts()
+        if wait > 0:
+            print(f"[SWEEP {contest.name}] Last cycle {state['cycle_id']} finished, next one in {wait}s")
+            await asyncio.sleep(wait)
 
+    while True:
+        try:
+            await sweep_cycle(outbox, cfg, contest, rpc, limiter, interval)
         except Exception as e:
-            print(f"[SWEEP] Fatal sweep error: {e}")
+            print(f"[SWEEP {contest.name}] Fatal sweep error: {e}")
 
-        await asyncio.sleep(cfg.sweep_every_seconds)
+        await asyncio.sleep(interval)
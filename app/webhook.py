@@ -0,0 +1,110 @@
+import asyncio
+import hmac
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from .config import Config
+from .metrics import QUEUE_DEPTH
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# how long shutdown waits for updates that are still being handled
+DRAIN_SECONDS = 10
+
+
+class WebhookServer:
+    """
+    Receives updates from Telegram over HTTP instead of long polling.
+
+    Each POST is validated (secret token header), acknowledged straight away
+    and handled in the background through dp.feed_update. At most
+    max_concurrency updates are handled at once: beyond that the response is
+    held until a slot frees up, which makes Telegram slow down its deliveries
+    rather than the bot queueing without bound.
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher, path: str, secret: str = "", max_concurrency: int = 100):
+        self.bot = bot
+        self.dp = dp
+        self.path = path
+        self.secret = secret
+        self._slots = asyncio.Semaphore(max(1, max_concurrency))
+        self._tasks = set()
+        QUEUE_DEPTH.set_function(lambda: len(self._tasks), "webhook_in_flight")
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception:
+            return web.Response(status=400)
+
+        await self._slots.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.json_response({})
+
+    async def _process(self, update: Update):
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            print(f"[WEBHOOK] Update {update.update_id} failed: {e}")
+        finally:
+            self._slots.release()
+
+    async def drain(self, timeout: float = DRAIN_SECONDS):
+        """Wait for in-flight updates, cancelling whatever is left after timeout."""
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"[WEBHOOK] Cancelled {len(pending)} updates still running at shutdown")
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, cfg: Config):
+    """
+    Serve cfg.webhook_path on cfg.webhook_host:cfg.webhook_port and point the
+    bot's webhook at cfg.webhook_url + cfg.webhook_path until SIGINT/SIGTERM.
+    The webhook is left registered on exit so updates queue at Telegram
+    across restarts; polling mode deletes it on start (main.py).
+    """
+    server = WebhookServer(bot, dp, cfg.webhook_path, cfg.webhook_secret, cfg.webhook_max_concurrency)
+    runner = web.AppRunner(server.app())
+    await runner.setup()
+    site = web.TCPSite(runner, cfg.webhook_host, cfg.webhook_port)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await dp.emit_startup(bot=bot)
+    try:
+        await site.start()
+        await bot.set_webhook(
+            cfg.webhook_url.rstrip("/") + cfg.webhook_path,
+            secret_token=cfg.webhook_secret or None,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=min(100, cfg.webhook_max_concurrency),
+        )
+        print(f"[WEBHOOK] Listening on {cfg.webhook_host}:{cfg.webhook_port}{cfg.webhook_path}")
+        await stop.wait()
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+        # stop accepting first, then let running handlers finish
+        await site.stop()
+        await server.drain()
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
@@ -0,0 +1,88 @@
+"""
+Multi-contest routing benchmark: the same total traffic (bench.updates
+DEFAULT_MIX) sent to one contest group, then spread over --groups contest
+groups, each scoring into its own shard (app.contests). Updates from all
+groups are interleaved and fed with --concurrency in flight, as polling or
+the webhook would.
+
+Reports throughput, p50/p99 feed_update latency and points per shard; with
+one shard per group, writes from different groups go to different writer
+threads and files instead of queueing behind each other.
+
+Run from the repo root:
+    python -m bench.contests [--updates 8000] [--groups 4] [--users 500] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+from aiogram.types import Update
+
+from .harness import GROUP_ID, contest_bots
+from .pipeline import pct
+from .updates import synthetic_updates
+
+
+async def run(groups: int, args) -> dict:
+    _, bot, dp, contests = await contest_bots(args.users, groups)
+    try:
+        per_group = [
+            synthetic_updates(args.updates // groups, GROUP_ID - i, args.users, seed=args.seed + i)
+            for i in range(groups)
+        ]
+        interleaved = [u for batch in itertools.zip_longest(*per_group) for u in batch if u is not None]
+        # update_id is unique per bot (message ids are only unique per chat); repeated
+        # ids collide in aiogram's lru_cached Update.event_type and cost deep __eq__ calls
+        for update_id, u in enumerate(interleaved, 1):
+            u["update_id"] = update_id
+        updates = [Update.model_validate(u, context={"bot": bot}) for u in interleaved]
+        latencies = []
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async def feed(update):
+            async with slots:
+                t = time.perf_counter()
+                await dp.feed_update(bot, update)
+                latencies.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        await asyncio.gather(*(feed(u) for u in updates))
+        await asyncio.gather(*(c.db.flush() for c in contests))
+        elapsed = time.perf_counter() - t
+
+        points = {}
+        for contest in contests:
+            rows = await contest.db.top_leaderboard(args.users)
+            points[contest.name] = sum(int(r["points"]) for r in rows)
+        latencies.sort()
+        return {
+            "updates_per_s": len(updates) / elapsed,
+            "p50_ms": pct(latencies, 0.5) * 1000,
+            "p99_ms": pct(latencies, 0.99) * 1000,
+            "points": points,
+        }
+    finally:
+        await contests.close()
+        await bot.session.close()
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--updates", type=int, default=8000, help="total, split evenly over the groups")
+    ap.add_argument("--groups", type=int, default=4)
+    ap.add_argument("--users", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    print(f"updates={args.updates} users={args.users} concurrency={args.concurrency}")
+    print(f"{'groups':>6} {'upd/s':>8} {'p50 ms':>8} {'p99 ms':>8}  points per shard")
+    for groups in sorted({1, args.groups}):
+        r = await run(groups, args)
+        shards = " ".join(f"{name}={n}" for name, n in r["points"].items())
+        print(f"{groups:6d} {r['updates_per_s']:8.0f} {r['p50_ms']:8.3f} {r['p99_ms']:8.3f}  {shards}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Handler latency under concurrent load: sync DB on the event loop vs AsyncDB.
+
+Run from the repo root:
+    python -m bench.db_latency [--events 2000] [--rate 400]
+
+Each simulated handler does what a scored group message does
+(contest_is_live + get_user + insert_meme + add_points). Updates arrive at a
+fixed rate (open loop) and latency is measured from the scheduled arrival, so
+time spent queued behind a blocked loop counts. A heartbeat task measures how
+long the event loop is stalled.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from app.db import DB, AsyncDB
+
+USERS = 2000
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def seed(path: str):
+    db = DB(path)
+    db.init()
+    con = db.conn()
+    with con:
+        con.executemany(
+            "INSERT OR IGNORE INTO users(tg_id, username, wallet, verified, joined_at) VALUES(?,?,?,1,?)",
+            [(i, f"user{i}", "w", 1_700_000_000 + i) for i in range(USERS)],
+        )
+        con.executemany("INSERT OR IGNORE INTO points(tg_id, points) VALUES(?,0)", [(i,) for i in range(USERS)])
+    db.set_contest_days(14)
+    db.close()
+
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - t - 0.001)
+
+
+async def run(database, is_async: bool, events: int, rate: float):
+    async def call(fn, *args):
+        return (await fn(*args)) if is_async else fn(*args)
+
+    async def handler(tg_id: int, mid: int, arrived: float, latencies: list):
+        if await call(database.contest_is_live):
+            u = await call(database.get_user, tg_id)
+            if u and int(u["verified"]) == 1:
+                if await call(database.insert_meme, -100, mid, tg_id):
+                    await call(database.add_points, tg_id, 1)
+        latencies.append(time.perf_counter() - arrived)
+
+    latencies, lags = [], []
+    stop = asyncio.Event()
+    hb = asyncio.create_task(heartbeat(stop, lags))
+    tasks = []
+    t0 = time.perf_counter()
+    for i in range(events):
+        arrival = t0 + i / rate
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(handler(i % USERS, i + 1, arrival, latencies)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await hb
+    return latencies, lags, elapsed
+
+
+def report(name, latencies, lags, elapsed):
+    ms = 1000
+    print(
+        f"{name:<10} events={len(latencies)} throughput={len(latencies) / elapsed:,.0f}/s "
+        f"handler p50={statistics.median(latencies) * ms:.2f}ms p99={pct(latencies, 99) * ms:.2f}ms | "
+        f"loop lag p99={pct(lags, 99) * ms:.2f}ms max={max(lags) * ms:.2f}ms"
+    )
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=2000)
+    ap.add_argument("--rate", type=float, default=400, help="arriving updates per second")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "before.db")
+        seed(path)
+        db = DB(path)
+        report("sync", *await run(db, False, args.events, args.rate))
+        db.close()
+
+        path = os.path.join(tmp, "after.db")
+        seed(path)
+        adb = AsyncDB(path)
+        await adb.init()
+        report("async", *await run(adb, True, args.events, args.rate))
+        await adb.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+getTokenAccountsByOwner decoding: jsonParsed (current default) vs a base64
+dataSlice of the 8-byte amount, for wallets with many token accounts.
+
+Run from the repo root:
+    python -m bench.decode [--accounts 1,20,500] [--iterations 2000]
+
+Reports response size and per-response decode time for:
+- jsonParsed: json.loads + walk to tokenAmount.amount (sum_token_amounts)
+- base64+json: json.loads + struct-decode the slice (sum_base64_amounts)
+- base64+scan: regex over raw bytes + struct, no JSON tree (scan_base64_amounts)
+The account JSON mirrors what mainnet RPCs return.
+"""
+import argparse
+import base64
+import json
+import random
+import time
+
+from app.solana import TOKEN_PROGRAM_ID, scan_base64_amounts, sum_base64_amounts, sum_token_amounts
+
+from .stub_rpc import fake_wallets
+
+MINT = "7VskDPVqgyf5VLtAVw23renwvepm4zScHeuHHw2dpump"
+DECIMALS = 6
+
+
+def account_common() -> dict:
+    return {
+        "executable": False,
+        "lamports": 2039280,
+        "owner": TOKEN_PROGRAM_ID,
+        "rentEpoch": 18446744073709551615,
+        "space": 165,
+    }
+
+
+def responses(n: int, seed: int = 0):
+    rnd = random.Random(seed)
+    owner = fake_wallets(1, seed)[0]
+    pubkeys = fake_wallets(n, seed + 1)
+    amounts = [rnd.randrange(10 ** 15) for _ in range(n)]
+
+    parsed, sliced = [], []
+    for pubkey, amount in zip(pubkeys, amounts):
+        ui = amount / 10 ** DECIMALS
+        parsed.append({"account": {**account_common(), "data": {
+            "parsed": {"info": {
+                "isNative": False, "mint": MINT, "owner": owner, "state": "initialized",
+                "tokenAmount": {"amount": str(amount), "decimals": DECIMALS, "uiAmount": ui, "uiAmountString": str(ui)},
+            }, "type": "account"},
+            "program": "spl-token", "space": 165,
+        }}, "pubkey": pubkey})
+        sliced.append({"account": {**account_common(), "data": [
+            base64.b64encode(amount.to_bytes(8, "little")).decode(), "base64",
+        ]}, "pubkey": pubkey})
+
+    def envelope(value):
+        return json.dumps({"jsonrpc": "2.0", "id": 1, "result": {"context": {"slot": 1}, "value": value}}).encode()
+
+    return envelope(parsed), envelope(sliced), sum(amounts)
+
+
+def per_call_us(fn, body: bytes, iterations: int) -> float:
+    t = time.perf_counter()
+    for _ in range(iterations):
+        fn(body)
+    return (time.perf_counter() - t) / iterations * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--accounts", default="1,20,500")
+    ap.add_argument("--iterations", type=int, default=2000)
+    args = ap.parse_args()
+
+    cases = [
+        ("jsonParsed", True, lambda b: sum_token_amounts(json.loads(b)["result"])),
+        ("base64+json", False, lambda b: sum_base64_amounts(json.loads(b)["result"])),
+        ("base64+scan", False, scan_base64_amounts),
+    ]
+    for n in (int(x) for x in args.accounts.split(",")):
+        parsed_body, sliced_body, expected = responses(n)
+        iterations = max(20, args.iterations // n)
+        print(f"accounts={n}")
+        for name, uses_parsed, fn in cases:
+            body = parsed_body if uses_parsed else sliced_body
+            assert fn(body) == expected, name
+            us = per_call_us(fn, body, iterations)
+            print(f"  {name:<12} bytes={len(body):>8}  decode={us:>9.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Reply / reaction dedup cost: AsyncDB.mark_reaction_scored with the in-memory
+ScoredKeys index vs the previous path (a sqlite read for every check).
+
+Seeds --stored scored reactions, then times AsyncDB.init (index load) and
+three workloads of --marks calls each:
+  new      first likes on fresh (meme, user) pairs
+  toggle   the same likes again after they were flushed (remove + re-add)
+  old      re-likes of keys stored before startup (Bloom "maybe" -> sqlite)
+Reported per workload: microseconds per call and sqlite reads per call.
+
+Also checks the flush race: a flush that commits a key while another
+handler's sqlite read of the same key is in flight must not let it score twice.
+
+Run from the repo root:
+    python -m bench.dedup [--stored 1000000] [--marks 20000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+
+from app.db import AsyncDB, DB
+
+CHAT = -1001234567890
+
+
+def seed(path: str, stored: int):
+    db = DB(path)
+    db.init()
+    con = db.conn()
+    with con:
+        con.executemany(
+            "INSERT INTO scored_reactions(chat_id, meme_message_id, user_id, created_ts) VALUES(?,?,?,0)",
+            ((CHAT, i // 1000, i % 1000) for i in range(stored)),
+        )
+    db.close()
+
+
+def count_reads(adb: AsyncDB) -> dict:
+    counter = {"reads": 0}
+    read = adb._read
+
+    async def counted(fn, *args):
+        counter["reads"] += 1
+        return await read(fn, *args)
+
+    adb._read = counted
+    return counter
+
+
+async def old_path(adb: AsyncDB, key) -> bool:
+    """Pre-index mark_reaction_scored: buffer check, then always ask sqlite."""
+    if adb._unflushed_reaction(key):
+        return False
+    return not await adb._read(adb.db.reaction_scored, *key)
+
+
+async def run(path: str, args, indexed: bool) -> dict:
+    adb = AsyncDB(path, dedup_capacity=args.capacity)
+    t = time.perf_counter()
+    await adb.init()
+    load_s = time.perf_counter() - t
+    reads = count_reads(adb)
+
+    rnd = random.Random(1)
+    base = args.stored // 1000 + 1
+    fresh = [(CHAT, base + i // 1000, i % 1000) for i in range(args.marks)]
+    old = [(CHAT, rnd.randrange(args.stored) // 1000, rnd.randrange(1000)) for _ in range(args.marks)]
+    out = {}
+    for name, keys in (("new", fresh), ("toggle", fresh), ("old", old)):
+        before = reads["reads"]
+        t = time.perf_counter()
+        for key in keys:
+            if indexed:
+                await adb.mark_reaction_scored(*key)
+            else:
+                await old_path(adb, key)
+        out[name] = ((time.perf_counter() - t) / len(keys) * 1e6, (reads["reads"] - before) / len(keys))
+        if not indexed and name == "new":
+            for key in keys:  # the old path only checks; store them for the toggle round
+                await adb.mark_reaction_scored(*key)
+        await adb.flush()  # toggles come later than the write-behind window
+    index = adb.scored_reactions
+    out["load"] = (load_s, index.nbytes, len(index))
+    await adb.close()
+    return out
+
+
+async def race_check(path: str) -> bool:
+    """
+    Two mark_reaction_scored calls for one key: the first one's sqlite read
+    takes its snapshot and then stalls while the second one buffers the key
+    and a flush commits it. True if only one of them scored.
+    """
+    adb = AsyncDB(path, flush_interval_ms=10**6, dedup_capacity=1000)
+    await adb.init()
+    key = (CHAT, 10**9, 1)
+    adb.scored_reactions.lookup = lambda k: None  # force the sqlite check ("maybe")
+    scored = adb.db.reaction_scored
+    stalled = threading.Event()
+
+    def stalling_read(*k):
+        result = scored(*k)
+        if not stalled.is_set():
+            stalled.set()
+            time.sleep(0.2)
+        return result
+
+    adb.db.reaction_scored = stalling_read
+
+    async def second():
+        while not stalled.is_set():
+            await asyncio.sleep(0.01)
+        ok = await adb.mark_reaction_scored(*key)
+        await adb.flush()
+        return ok
+
+    results = await asyncio.gather(adb.mark_reaction_scored(*key), second())
+    await adb.close()
+    return sum(results) == 1
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stored", type=int, default=1_000_000)
+    ap.add_argument("--marks", type=int, default=20_000)
+    ap.add_argument("--capacity", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    results = {}
+    for indexed in (False, True):
+        path = os.path.join(tmp, f"dedup-{indexed}.db")
+        seed(path, args.stored)
+        results[indexed] = await run(path, args, indexed)
+
+    load_s, nbytes, keys = results[True]["load"]
+    print(f"stored={args.stored} index: {keys} keys, {nbytes / 2**20:.1f} MiB of filters, loaded in {load_s:.2f}s")
+    print(f"{'workload':<8} {'sqlite us':>10} {'reads':>6} {'index us':>9} {'reads':>6}")
+    for name in ("new", "toggle", "old"):
+        (ou, orr), (iu, ir) = results[False][name], results[True][name]
+        print(f"{name:<8} {ou:10.1f} {orr:6.2f} {iu:9.1f} {ir:6.2f}")
+
+    ok = await race_check(os.path.join(tmp, "race.db"))
+    print(f"flush during a dedup read: {'scored once' if ok else 'SCORED TWICE'}")
+    assert ok, "a key flushed during a sqlite dedup read was scored twice"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,150 @@
+"""
+Per-update dispatch cost on mixed chat traffic: the filtered scoring
+handlers (app.bot.register_scoring) vs a replica of the previous catch-all
+handlers, which ran a handler body for every message and shadowed the reply
+handler.
+
+Each traffic class is fed through dp.feed_update on its own so the cost per
+class is visible; "other chat" is group/private traffic outside the contest
+group, which the filtered handlers reject before any handler body runs. Reported per class: microseconds
+per update and DB calls per update (see bench.pipeline.time_db_calls).
+
+Run from the repo root:
+    python -m bench.dispatch [--updates 2000] [--users 200]
+"""
+import argparse
+import asyncio
+import dataclasses
+import time
+
+from aiogram import Router
+from aiogram.types import Message, MessageReactionUpdated, Update
+
+from app.bot import LIKE_EMOJIS, build_dispatcher, is_meme_media
+from app.contests import Contests
+from app.outbox import Outbox
+from app.solana import SolanaClient
+
+from .harness import GROUP_ID, contest_bot
+from .pipeline import time_db_calls
+from .updates import chatter, meme_post, reaction, reply
+
+OTHER_GROUP = -1009999999999
+
+
+def traffic(n: int, users: int, memes: int):
+    """{class: [update dicts]}; memes 1..memes are posted first by run()."""
+    classes = {
+        "other chat": lambda i: chatter(i, OTHER_GROUP if i % 2 else 10_000 + i, 1 + i % users),
+        "group chatter": lambda i: chatter(i, GROUP_ID, 1 + i % users),
+        "meme post": lambda i: meme_post(i, GROUP_ID, 1 + i % users),
+        "reply": lambda i: reply(i, GROUP_ID, 1 + i % users, 1 + i % memes),
+        "reaction (like)": lambda i: reaction(i, GROUP_ID, 1 + i % users, 1 + i % memes, "🔥"),
+        "reaction (other)": lambda i: reaction(i, GROUP_ID, 1 + i % users, 1 + i % memes, "😢"),
+    }
+    # update_id is unique per bot: repeated ids collide in aiogram's lru_cached
+    # Update.event_type and cost deep __eq__ calls
+    out = {}
+    for k, (name, make) in enumerate(classes.items()):
+        start = memes + 1 + k * n
+        out[name] = [make(i) for i in range(start, start + n)]
+    return out
+
+
+def legacy_dispatcher(bot, cfg, database):
+    """The commands plus the previous unfiltered scoring handlers, tried after them."""
+    group_id = cfg.contests[0].group_id
+    no_contests = Contests(dataclasses.replace(cfg, contests=()))  # no scoring handlers registered
+    dp = build_dispatcher(bot, cfg, no_contests, SolanaClient(cfg.sol_rpc_url), Outbox(bot))
+    # previously every message went through each Command filter: drop the IsCommand prefilter
+    for router in dp.sub_routers:
+        router.message._handler.filters = None
+    legacy = Router(name="legacy")
+    dp.include_router(legacy)
+
+    @legacy.message()
+    async def meme_post_points(m: Message):
+        if group_id == 0 or m.chat.id != group_id:
+            return
+        if not m.from_user:
+            return
+        if m.reply_to_message is not None:
+            return
+        if not is_meme_media(m):
+            return
+        if not await database.contest_is_live():
+            return
+        if not await database.is_eligible(m.from_user.id):
+            return
+        if await database.insert_meme(m.chat.id, m.message_id, m.from_user.id):
+            await database.add_points(m.from_user.id, 1)
+
+    @legacy.message()
+    async def meme_reply_points(m: Message):  # never reached: meme_post_points claims every message
+        pass
+
+    @legacy.message_reaction()
+    async def meme_like_points(event: MessageReactionUpdated):
+        if group_id == 0 or event.chat.id != group_id:
+            return
+        if not event.user:
+            return
+        new_emojis = {getattr(r, "emoji", None) for r in (event.new_reaction or [])}
+        if not (new_emojis & LIKE_EMOJIS):
+            return
+        if not await database.contest_is_live():
+            return
+        owner_id = await database.get_meme_owner(event.chat.id, event.message_id)
+        if owner_id is None:
+            return
+        if not await database.mark_reaction_scored(event.chat.id, event.message_id, event.user.id):
+            return
+        if not await database.is_eligible(owner_id):
+            return
+        await database.add_points(owner_id, 1)
+
+    return dp
+
+
+async def run(variant: str, args) -> dict:
+    cfg, bot, dp, db = await contest_bot(args.users)
+    if variant == "legacy":
+        dp = legacy_dispatcher(bot, cfg, db)
+    try:
+        # memes for replies / reactions to point at
+        for i in range(1, args.memes + 1):
+            await dp.feed_update(bot, Update.model_validate(meme_post(i, GROUP_ID, 1 + i % args.users), context={"bot": bot}))
+        await db.flush()
+
+        out = {}
+        calls = time_db_calls(db)
+        for name, raw in traffic(args.updates, args.users, args.memes).items():
+            updates = [Update.model_validate(u, context={"bot": bot}) for u in raw]
+            before = calls["calls"]
+            t = time.perf_counter()
+            for u in updates:
+                await dp.feed_update(bot, u)
+            out[name] = ((time.perf_counter() - t) / len(updates) * 1e6, (calls["calls"] - before) / len(updates))
+        return out
+    finally:
+        await db.close()
+        await bot.session.close()
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--updates", type=int, default=2000, help="per traffic class")
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--memes", type=int, default=100)
+    args = ap.parse_args()
+
+    legacy = await run("legacy", args)
+    filtered = await run("filtered", args)
+    print(f"{'class':<18} {'legacy us':>10} {'db/upd':>7} {'filtered us':>11} {'db/upd':>7}")
+    for name in legacy:
+        (lu, lc), (fu, fc) = legacy[name], filtered[name]
+        print(f"{name:<18} {lu:10.1f} {lc:7.2f} {fu:11.1f} {fc:7.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""
+In-process contest bot for the benchmarks: the real dispatcher over fresh
+contest shards in a temp dir, each with `users` verified + joined
+participants and a live contest. Nothing talks to Telegram or Solana as long
+as the updates fed in only trigger group scoring.
+"""
+import dataclasses
+import os
+import tempfile
+
+from aiogram import Bot
+
+from app.bot import build_dispatcher
+from app.config import ContestSpec, load_config
+from app.contests import Contests
+from app.outbox import Outbox
+from app.solana import SolanaClient
+
+GROUP_ID = -1001234567890
+TOKEN = "123456:" + "A" * 35
+MINT = "7VskDPVqgyf5VLtAVw23renwvepm4zScHeuHHw2dpump"
+
+
+def bench_config(**overrides):
+    for key, value in (
+        ("BOT_TOKEN", TOKEN), ("SOL_RPC_URL", "http://127.0.0.1:1"), ("TOKEN_MINT", MINT), ("CONTEST_GROUP_ID", str(GROUP_ID)),
+    ):
+        os.environ.setdefault(key, value)
+    return dataclasses.replace(load_config(), **overrides)
+
+
+async def contest_bots(users: int, groups: int, **cfg_overrides):
+    """(cfg, bot, dp, contests) for groups GROUP_ID, GROUP_ID - 1, ...; close contests when done."""
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    specs = tuple(
+        ContestSpec(f"c{i}", GROUP_ID - i, MINT, 5.0, os.path.join(tmp, f"c{i}.db"), os.path.join(tmp, f"c{i}-archive.db"))
+        for i in range(groups)
+    )
+    cfg = bench_config(contests=specs, **cfg_overrides)
+    contests = Contests(cfg)
+    await contests.init()
+    for contest in contests:
+        db = contest.db
+        for uid in range(1, users + 1):
+            await db.ensure_user(uid, f"user{uid}")
+            await db.set_verified(uid, f"wallet{uid}", 1)
+            await db.mark_joined(uid)
+        await db.set_contest_days(14)
+
+    bot = Bot(TOKEN)
+    dp = build_dispatcher(bot, cfg, contests, SolanaClient(cfg.sol_rpc_url), Outbox(bot))
+    return cfg, bot, dp, contests
+
+
+async def contest_bot(users: int, **cfg_overrides):
+    """(cfg, bot, dp, db) for one contest in GROUP_ID; close db when done."""
+    cfg, bot, dp, contests = await contest_bots(users, 1, **cfg_overrides)
+    return cfg, bot, dp, contests.for_chat(GROUP_ID).db
@@ -0,0 +1,155 @@
+"""
+HolderWatcher against a mock RPC websocket (programSubscribe) plus the local
+stub RPC for the balance re-checks.
+
+Three runs:
+  notify    notifications for an unwatched owner, a watched holder (twice,
+            inside the debounce window) and a watched wallet below the
+            minimum: one re-check per watched wallet, only the wallet below
+            the minimum is unverified and DMed
+  failure   a re-check that raises is logged and forgotten, not left pending
+  cancel    cancelling run() while re-checks are in flight cancels them, so
+            nothing is checked or stored after run() has returned
+
+Run from the repo root:
+    python -m bench.holders_ws [--latency-ms 200]
+"""
+import argparse
+import asyncio
+import base64
+import dataclasses
+
+from aiohttp import web
+
+import app.holders as holders
+from app.holders import HolderWatcher
+from app.solana import OWNER_OFFSET, TOKEN_ACCOUNT_SIZE, SolanaClient
+
+from .harness import contest_bots
+from .stub_rpc import DECIMALS, b58decode, balance_of, fake_wallets, make_app
+
+
+class Notices:
+    """Outbox stand-in: records DMs, raises for tg_ids in `broken`."""
+
+    def __init__(self):
+        self.sent = []
+        self.broken = set()
+
+    def send(self, chat_id: int, text: str, **kwargs):
+        if chat_id in self.broken:
+            raise RuntimeError(f"send to {chat_id} failed")
+        self.sent.append(chat_id)
+
+
+def notification(owner: str) -> dict:
+    data = bytearray(TOKEN_ACCOUNT_SIZE)
+    data[OWNER_OFFSET:OWNER_OFFSET + 32] = b58decode(owner)
+    account = {"data": [base64.b64encode(bytes(data)).decode(), "base64"]}
+    return {
+        "jsonrpc": "2.0",
+        "method": "programNotification",
+        "params": {"result": {"context": {"slot": 1}, "value": {"pubkey": "acct", "account": account}}, "subscription": 7},
+    }
+
+
+async def start_rpc(latency_ms: float, feed: asyncio.Queue):
+    """Stub RPC with a /ws route that acks the subscription and pushes the owners put on feed (None ends it)."""
+
+    async def ws_handler(request: web.Request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        msg = await ws.receive_json()
+        assert msg["method"] == "programSubscribe", msg
+        await ws.send_json({"jsonrpc": "2.0", "result": 7, "id": msg["id"]})
+        while (owner := await feed.get()) is not None:
+            await ws.send_json(notification(owner))
+        await ws.close()
+        return ws
+
+    app = make_app(latency_ms=latency_ms)
+    app.router.add_get("/ws", ws_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port, app["stats"]
+
+
+async def settle(watcher: HolderWatcher):
+    """Wait until no re-check is debounced or running."""
+    while watcher._due or watcher._rechecks:
+        await asyncio.sleep(0.01)
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency-ms", type=float, default=200)
+    args = ap.parse_args()
+    holders.DEBOUNCE_SECONDS = 0.05
+
+    feed = asyncio.Queue()
+    runner, port, stats = await start_rpc(args.latency_ms, feed)
+    cfg, bot, _, contests = await contest_bots(0, 1, sol_ws_url=f"ws://127.0.0.1:{port}/ws", kick_on_fail=False)
+    contest = next(iter(contests))
+    rich, poor, stranger, flaky, slow = sorted(fake_wallets(5), key=balance_of, reverse=True)
+    users = {1: rich, 2: poor, 3: flaky, 4: slow}
+    for tg_id, wallet in users.items():
+        await contest.db.ensure_user(tg_id, f"user{tg_id}")
+        await contest.db.set_verified(tg_id, wallet, 1)
+        await contest.db.mark_joined(tg_id)
+    # minimum halfway between poor's and rich's balance
+    min_tokens = (balance_of(rich) + balance_of(poor)) / 2 / 10 ** DECIMALS
+    contest = dataclasses.replace(contest, spec=dataclasses.replace(contest.spec, min_hold_usd=min_tokens))
+
+    rpc = SolanaClient(f"http://127.0.0.1:{port}/")
+    await rpc.start()
+
+    async def price_usd(mint):
+        return 1.0
+
+    rpc.get_price_usd_dexscreener = price_usd
+    notices = Notices()
+    watcher = HolderWatcher(notices, cfg, contest, rpc)
+    run = asyncio.create_task(watcher.run())
+    try:
+        for owner in (stranger, rich, rich, poor):
+            feed.put_nowait(owner)
+        await asyncio.sleep(0.2)
+        await settle(watcher)
+        print(f"notify : {stats['calls']} balance requests, DMs to {notices.sent}, eligible {sorted(contest.db.eligible)}")
+        # getTokenSupply for the decimals, then one getTokenAccountsByOwner per watched wallet
+        assert stats["calls"] == 3, "expected one re-check per watched wallet"
+        assert notices.sent == [2], "only the wallet below the minimum should be notified"
+        assert contest.db.eligible == {1, 3, 4}, contest.db.eligible
+
+        # flaky is below the minimum too; its DM raising must not leave the task behind
+        notices.broken.add(3)
+        feed.put_nowait(flaky)
+        await asyncio.sleep(0.2)
+        await settle(watcher)
+        print(f"failure: pending re-checks {len(watcher._rechecks)}")
+        assert not watcher._rechecks
+
+        feed.put_nowait(slow)
+        while not watcher._rechecks:
+            await asyncio.sleep(0.01)
+        run.cancel()
+        await asyncio.gather(run, return_exceptions=True)
+        await asyncio.sleep(args.latency_ms / 1000 * 3)
+        checked = (await contest.db.get_user(4))["last_checked_ts"]
+        print(f"cancel : pending re-checks {len(watcher._rechecks)}, last_checked_ts={checked}")
+        assert not watcher._rechecks, "re-checks outlived run()"
+        assert checked is None, "a re-check stored its result after run() was cancelled"
+    finally:
+        run.cancel()
+        feed.put_nowait(None)
+        await rpc.close()
+        await runner.cleanup()
+        await contests.close()
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
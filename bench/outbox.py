@@ -0,0 +1,151 @@
+"""
+Outbound messages against a fake Bot that enforces Telegram-like flood limits:
+more than --limit-rps sends in any second, a second message to the same
+private chat within a second, or a 21st message to a group within a minute is
+answered with TelegramRetryAfter.
+
+Compares the old inline path (the sweep awaiting every DM itself) with the
+Outbox: how long the sweep is blocked, how many sends were flood-limited, and
+how long a command reply waits behind a backlog of notices.
+
+Then floods one group with --group-flood messages (well past its 20/min
+budget) and checks that the group's bucket alone holds it back (no
+flood-limited sends) and that a DM reply sent behind them is still delivered
+within --dm-max-ms: a group's empty bucket must not hold up the workers.
+
+Run from the repo root:
+    python -m bench.outbox [--notices 300] [--limit-rps 30] [--send-ms 20] [--group-flood 40]
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict, deque
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from app.outbox import GROUP_CHAT_BURST, PRIORITY_REPLY, Outbox
+
+
+class FakeBot:
+    def __init__(self, limit_rps: float, send_ms: float):
+        self.limit_rps = limit_rps
+        self.send_ms = send_ms
+        self.recent = deque()  # send times in the last second
+        self.last_by_chat = defaultdict(float)
+        self.group_recent = defaultdict(deque)  # chat_id -> send times in the last minute
+        self.sent = 0
+        self.flooded = 0
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        await asyncio.sleep(self.send_ms / 1000)
+        now = time.monotonic()
+        while self.recent and now - self.recent[0] >= 1:
+            self.recent.popleft()
+        group = self.group_recent[chat_id] if chat_id < 0 else None
+        while group and now - group[0] >= 60:
+            group.popleft()
+        if (
+            len(self.recent) >= self.limit_rps
+            or (chat_id > 0 and now - self.last_by_chat[chat_id] < 1)
+            or (group is not None and len(group) >= 20)
+        ):
+            self.flooded += 1
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), "Too Many Requests", 1)
+        self.recent.append(now)
+        if group is not None:
+            group.append(now)
+        self.last_by_chat[chat_id] = now
+        self.sent += 1
+        return {"chat_id": chat_id, "text": text}
+
+
+async def run_inline(args) -> dict:
+    """The pre-outbox behaviour: await each DM in the sweep, give up on errors."""
+    bot = FakeBot(args.limit_rps, args.send_ms)
+    t0 = time.perf_counter()
+    failed = 0
+    for i in range(args.notices):
+        try:
+            await bot.send_message(1_000 + i, "notice")
+        except Exception:
+            failed += 1
+    blocked = time.perf_counter() - t0
+    return {"sweep_blocked_s": blocked, "delivered": bot.sent, "failed": failed, "flooded": bot.flooded}
+
+
+async def run_outbox(args) -> dict:
+    bot = FakeBot(args.limit_rps, args.send_ms)
+    outbox = Outbox(bot, global_rps=args.global_rps, workers=args.workers)
+    await outbox.start()
+
+    t0 = time.perf_counter()
+    futs = [outbox.send(1_000 + i, "notice") for i in range(args.notices)]
+    blocked = time.perf_counter() - t0
+
+    # a command reply arriving while the notice backlog drains
+    await asyncio.sleep(0.2)
+    r0 = time.perf_counter()
+    await outbox.send(42, "/myrank answer", PRIORITY_REPLY)
+    reply_ms = (time.perf_counter() - r0) * 1000
+
+    results = await asyncio.gather(*futs, return_exceptions=True)
+    drained = time.perf_counter() - t0
+    await outbox.close()
+    failed = sum(1 for r in results if isinstance(r, Exception))
+    return {
+        "sweep_blocked_s": blocked, "delivered": bot.sent - 1, "failed": failed,
+        "flooded": bot.flooded, "reply_ms": reply_ms, "drained_s": drained,
+    }
+
+
+async def run_flooded_group(args) -> dict:
+    bot = FakeBot(args.limit_rps, args.send_ms)
+    outbox = Outbox(bot, global_rps=args.global_rps, workers=args.workers)
+    await outbox.start()
+
+    group = -1001234567890
+    flood = [outbox.send(group, "notice") for _ in range(args.group_flood // 2)]
+    flood += [outbox.send(group, "/top answer", PRIORITY_REPLY) for _ in range(args.group_flood // 2)]
+    await asyncio.sleep(0.1)  # the group's burst is spent, its other messages are waiting
+    r0 = time.perf_counter()
+    await outbox.reply(42, "/myrank answer")
+    dm_ms = (time.perf_counter() - r0) * 1000
+    group_sent = sum(1 for f in flood if f.done())
+    await outbox.close(timeout=0)
+    return {"dm_ms": dm_ms, "group_sent": group_sent, "flooded": bot.flooded}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--notices", type=int, default=300)
+    ap.add_argument("--limit-rps", type=float, default=30)
+    ap.add_argument("--global-rps", type=float, default=25)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--send-ms", type=float, default=20)
+    ap.add_argument("--group-flood", type=int, default=40)
+    ap.add_argument("--dm-max-ms", type=float, default=250)
+    args = ap.parse_args()
+
+    inline = asyncio.run(run_inline(args))
+    print(
+        f"inline : sweep blocked {inline['sweep_blocked_s']:.2f}s, delivered {inline['delivered']}, "
+        f"failed {inline['failed']}, flood-limited {inline['flooded']}"
+    )
+    queued = asyncio.run(run_outbox(args))
+    print(
+        f"outbox : sweep blocked {queued['sweep_blocked_s'] * 1000:.2f}ms, delivered {queued['delivered']}, "
+        f"failed {queued['failed']}, flood-limited {queued['flooded']}, "
+        f"reply latency {queued['reply_ms']:.0f}ms, backlog drained in {queued['drained_s']:.1f}s"
+    )
+    flooded = asyncio.run(run_flooded_group(args))
+    print(
+        f"flooded group: {flooded['group_sent']}/{args.group_flood} group messages sent, "
+        f"flood-limited {flooded['flooded']}, DM reply latency {flooded['dm_ms']:.0f}ms"
+    )
+    assert flooded["group_sent"] == GROUP_CHAT_BURST and not flooded["flooded"], "the group bucket let too many through"
+    assert flooded["dm_ms"] < args.dm_max_ms, "DM reply waited behind a flooded group"
+
+
+if __name__ == "__main__":
+    main()
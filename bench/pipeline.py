@@ -0,0 +1,134 @@
+"""
+Scoring pipeline benchmark: synthetic group updates (bench.updates) fed
+straight into the real Dispatcher via feed_update, against a fresh temp DB
+per scenario (bench.harness) with no Telegram or Solana traffic.
+
+Scenarios:
+    posts      meme posts only
+    replies    a few memes, then replies to them
+    reactions  reaction storm on a handful of memes (mostly duplicates)
+    mixed      bench.updates.DEFAULT_MIX
+
+Reports throughput, p50/p99 handler latency (feed_update per update) and the
+sqlite time per event (time spent inside DB calls on the reader/writer
+threads, including the final flush). The seed is fixed, and the resulting
+points checksum is printed so runs can be compared for regressions; it is
+only stable with --concurrency 1, since concurrent updates can let a reaction
+or reply overtake the meme post it belongs to.
+
+Run from the repo root:
+    python -m bench.pipeline [--updates 5000] [--users 500] [--concurrency 1] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+import zlib
+
+from aiogram.types import Update
+
+from .harness import GROUP_ID, contest_bot
+from .updates import DEFAULT_MIX, synthetic_updates
+
+SCENARIOS = {
+    "posts": (1, 0, 0, 0),
+    "replies": (0.05, 0.95, 0, 0),
+    "reactions": (0.01, 0, 0.99, 0),
+    "mixed": DEFAULT_MIX,
+}
+
+
+def pct(sorted_vals, p: float) -> float:
+    return sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * p))]
+
+
+def time_db_calls(db) -> dict:
+    """Wrap db's executor hooks to add the time spent inside each DB call."""
+    acc = {"seconds": 0.0, "calls": 0}
+    lock = threading.Lock()
+    write, read = db._write, db._read
+
+    def timed(fn):
+        def run(*args):
+            t = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                with lock:
+                    acc["seconds"] += time.perf_counter() - t
+                    acc["calls"] += 1
+        return run
+
+    db._write = lambda fn, *args: write(timed(fn), *args)
+    db._read = lambda fn, *args: read(timed(fn), *args)
+    return acc
+
+
+async def run_scenario(name: str, args) -> dict:
+    _, bot, dp, db = await contest_bot(args.users)
+    try:
+        raw = synthetic_updates(args.updates, GROUP_ID, args.users, seed=args.seed, mix=SCENARIOS[name])
+        updates = [Update.model_validate(u, context={"bot": bot}) for u in raw]
+        db_time = time_db_calls(db)
+        latencies = []
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async def feed(update):
+            async with slots:
+                t = time.perf_counter()
+                await dp.feed_update(bot, update)
+                latencies.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        await asyncio.gather(*(feed(u) for u in updates))
+        await db.flush()
+        elapsed = time.perf_counter() - t
+
+        rows = await db.top_leaderboard(args.users)
+        points = sorted((r["tg_id"], int(r["points"])) for r in rows)
+        latencies.sort()
+        return {
+            "scenario": name,
+            "updates": len(updates),
+            "updates_per_s": len(updates) / elapsed,
+            "p50_ms": pct(latencies, 0.5) * 1000,
+            "p99_ms": pct(latencies, 0.99) * 1000,
+            "db_us_per_event": db_time["seconds"] / len(updates) * 1e6,
+            "db_calls_per_event": db_time["calls"] / len(updates),
+            "total_points": sum(p for _, p in points),
+            "checksum": zlib.crc32(repr(points).encode()),
+        }
+    finally:
+        await db.close()
+        await bot.session.close()
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--updates", type=int, default=5000)
+    ap.add_argument("--users", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=1, help="updates in flight (polling runs them as tasks)")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", default="", help="also write the results to this file")
+    args = ap.parse_args()
+
+    results = []
+    print(f"updates={args.updates} users={args.users} concurrency={args.concurrency} seed={args.seed}")
+    print(f"{'scenario':<10} {'upd/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'db us/ev':>9} {'db calls/ev':>11} {'points':>7} {'checksum':>10}")
+    for name in args.scenarios.split(","):
+        r = await run_scenario(name, args)
+        results.append(r)
+        print(
+            f"{name:<10} {r['updates_per_s']:8.0f} {r['p50_ms']:8.3f} {r['p99_ms']:8.3f} "
+            f"{r['db_us_per_event']:9.1f} {r['db_calls_per_event']:11.2f} {r['total_points']:7d} {r['checksum']:10d}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+"""
+Query-plan regression check: runs every DB method against a 100k-user
+fixture, captures each SQL statement sqlite executes (trace callback) and
+runs EXPLAIN QUERY PLAN on it. Fails (exit 1) if any plan scans a table or
+index from end to end ("SCAN ...", covering index or not) or sorts in a temp
+b-tree ("USE TEMP B-TREE FOR ..."), unless the statement is listed in
+INTENDED_SCANS.
+
+Also checks that migrating a pre-versioning database (tables created without
+the later columns, user_version 0) ends at the current schema version.
+
+Run from the repo root:
+    python -m bench.query_plan [--users 100000]
+"""
+import argparse
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+
+from app.db import DB, MIGRATIONS
+
+# Statements (normalized as printed) that read a whole table on purpose;
+# their SCAN lines are allowed. A temp b-tree sort is never allowed.
+INTENDED_SCANS = [
+    # scored_reply_keys / scored_reaction_keys: ScoredKeys loads every key once, at startup
+    re.compile(r"^SELECT chat_id, reply_message_id FROM scored_replies$"),
+    re.compile(r"^SELECT chat_id, meme_message_id, user_id FROM scored_reactions$"),
+    # archive_contest copies whole tables into the archive database
+    re.compile(r"^INSERT OR IGNORE INTO archive\.\w+\(.*\) SELECT .* FROM main\.\w+$"),
+]
+SKIP_RE = re.compile(r"^\s*(PRAGMA|BEGIN|COMMIT|ROLLBACK|CREATE|ALTER|INSERT|ATTACH|DETACH|VACUUM)\b", re.I)
+
+
+def seed(db: DB, n: int):
+    rnd = random.Random(n)
+    con = db.conn()
+    with con:
+        con.executemany(
+            "INSERT INTO users(tg_id, username, wallet, verified, joined_at) VALUES(?,?,?,?,?)",
+            [
+                (i, f"user{i}", f"wallet{i}" if i % 3 else None, i % 2, 1_700_000_000 + i if i % 4 else None)
+                for i in range(1, n + 1)
+            ],
+        )
+        con.executemany("INSERT INTO points(tg_id, points) VALUES(?,?)", [(i, rnd.randint(0, 500)) for i in range(1, n + 1)])
+        con.executemany(
+            "INSERT INTO memes(chat_id, meme_message_id, owner_tg_id, created_ts) VALUES(?,?,?,?)",
+            [(-100, i, i, 0) for i in range(1, n // 10)],
+        )
+
+
+def exercise(db: DB, archive_path: str):
+    """Call every DB method once (the order keeps each call meaningful)."""
+    db.ensure_user(5, "user5")
+    db.get_user(5)
+    db.set_verified(5, "wallet5", 1)
+    db.mark_joined(5)
+    db.list_verified_users(only_joined=True)
+    db.list_verified_users(only_joined=False)
+    db.list_verified_page(0, 1000)
+    db.record_checks([(5, 0, 10, 60)])
+    db.reschedule_checks([(5, 30)])
+    db.due_for_check(100, 500)
+    db.count_due(100)
+    db.find_user_by_username("user5")
+    db.add_points(5, 1)
+    db.member_rows()
+    db.member_row(5)
+    db.contest_status()
+    db.contest_is_live()
+    db.set_contest_days(14)
+    db.insert_meme(-100, 10**9, 5)
+    db.get_meme_owner(-100, 10)
+    db.mark_reply_scored(-100, 10**9)
+    db.reply_scored(-100, 10**9)
+    db.mark_reaction_scored(-100, 10, 6)
+    db.reaction_scored(-100, 10, 6)
+    list(db.scored_reply_keys())
+    list(db.scored_reaction_keys())
+    db.apply_batch({5: 1}, {(-100, 10**9 + 1): (5, 0)}, {(-100, 10**9 + 2): 0}, {(-100, 10, 7): 0})
+    cycle = db.start_sweep_cycle(0.001, 6, 10**9)
+    db.save_sweep_progress(cycle, 5, [(5, 0, 10, 60)])
+    db.finish_sweep_cycle(cycle)
+    db.sweep_checkpoint()
+    db.unverify_and_optionally_kick(5, True)
+    db.end_contest()
+    db.archive_contest(archive_path)
+
+
+def check_plans(users: int) -> int:
+    tmp = tempfile.mkdtemp(prefix="qplan-")
+    db = DB(os.path.join(tmp, "contest.db"))
+    db.init()
+    seed(db, users)
+
+    statements = []
+    con = db.conn()
+    con.set_trace_callback(statements.append)
+    archive_path = os.path.join(tmp, "archive.db")
+    exercise(db, archive_path)
+    con.set_trace_callback(None)
+    con.execute("ATTACH DATABASE ? AS archive", (archive_path,))  # to explain the archive statements
+
+    seen = set()
+    failures = 0
+    for sql in statements:
+        if SKIP_RE.match(sql) and not re.search(r"\bSELECT\b", sql, re.I):
+            continue
+        key = re.sub(r"\s+", " ", re.sub(r"-?\b\d+(\.\d+)?\b", "?", sql)).strip()
+        if key in seen:
+            continue
+        seen.add(key)
+        plan = [row[3] for row in con.execute("EXPLAIN QUERY PLAN " + sql)]
+        scan_ok = any(r.match(key) for r in INTENDED_SCANS)
+        bad = [p for p in plan if "TEMP B-TREE" in p or p.startswith("SCAN ") and not scan_ok]
+        status = "FAIL" if bad else "ok  "
+        failures += bool(bad)
+        print(f"{status} {key[:110]}")
+        for p in plan:
+            print(f"       {p}")
+    db.close()
+    return failures
+
+
+def check_legacy_migration() -> bool:
+    """A database from before versioning migrates to the current version."""
+    path = os.path.join(tempfile.mkdtemp(prefix="qplan-"), "legacy.db")
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE users(tg_id INTEGER PRIMARY KEY, username TEXT, wallet TEXT, verified INTEGER DEFAULT 0, joined_at INTEGER)")
+    con.execute("CREATE TABLE points(tg_id INTEGER PRIMARY KEY, points INTEGER DEFAULT 0)")
+    con.execute("INSERT INTO users VALUES(1, 'a', 'w', 1, 1)")
+    con.commit()
+    con.close()
+
+    db = DB(path)
+    db.init()
+    db.init()  # idempotent
+    con = db.conn()
+    version = con.execute("PRAGMA user_version").fetchone()[0]
+    cols = {r["name"] for r in con.execute("PRAGMA table_info(users)")}
+    ok = version == len(MIGRATIONS) and "last_checked_ts" in cols and db.get_user(1) is not None
+    db.close()
+    print(f"{'ok  ' if ok else 'FAIL'} legacy database migrated to version {version}")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=100_000)
+    args = ap.parse_args()
+
+    failures = check_plans(args.users)
+    if not check_legacy_migration():
+        failures += 1
+    print(f"{failures} failing" if failures else "all query plans use indexes")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
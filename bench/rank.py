@@ -0,0 +1,87 @@
+"""
+/myrank cost: the original full-leaderboard scan (scan_rank) vs RankIndex.
+
+Run from the repo root:
+    python -m bench.rank [--sizes 100,10000,100000] [--lookups 200]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.db import DB
+from app.rank import RankIndex
+
+
+def seed(db: DB, n: int):
+    rnd = random.Random(n)
+    con = db.conn()
+    with con:
+        con.executemany(
+            "INSERT INTO users(tg_id, username, wallet, verified, joined_at) VALUES(?,?,?,1,?)",
+            [(i, f"user{i}", "w", 1_700_000_000 + i) for i in range(n)],
+        )
+        con.executemany(
+            "INSERT INTO points(tg_id, points) VALUES(?,?)",
+            [(i, rnd.randint(0, 500)) for i in range(n)],
+        )
+
+
+def scan_rank(db: DB, tg_id: int):
+    """The SQL /myrank ran before RankIndex: order every joined participant, find tg_id."""
+    rows = db.conn().execute("""
+      SELECT u.tg_id, p.points
+      FROM points p
+      CROSS JOIN users u ON u.tg_id = p.tg_id
+      WHERE u.joined_at IS NOT NULL
+      ORDER BY p.points DESC, u.joined_at ASC
+    """).fetchall()
+    for i, r in enumerate(rows, start=1):
+        if int(r["tg_id"]) == tg_id:
+            return (i, int(r["points"]))
+    return None
+
+
+def per_call_us(fn, ids):
+    t = time.perf_counter()
+    for tg_id in ids:
+        fn(tg_id)
+    return (time.perf_counter() - t) / len(ids) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100,10000,100000")
+    ap.add_argument("--lookups", type=int, default=200)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in (int(x) for x in args.sizes.split(",")):
+            db = DB(os.path.join(tmp, f"rank_{n}.db"))
+            db.init()
+            seed(db, n)
+
+            rnd = random.Random(0)
+            ids = [rnd.randrange(n) for _ in range(args.lookups)]
+            ranks = RankIndex()
+            t = time.perf_counter()
+            ranks.load(db.member_rows())
+            load_ms = (time.perf_counter() - t) * 1000
+
+            for tg_id in ids[:20]:
+                assert scan_rank(db, tg_id) == ranks.rank(tg_id), tg_id
+
+            scan_ids = ids[: max(5, args.lookups // max(1, n // 1000))]
+            scan = per_call_us(lambda i: scan_rank(db, i), scan_ids)
+            index = per_call_us(ranks.rank, ids)
+            update = per_call_us(lambda i: ranks.add(i, 1), ids)
+            print(
+                f"n={n:>7}  scan={scan:>10.1f}us  index={index:>6.2f}us  "
+                f"index_update={update:>6.2f}us  index_load={load_ms:.1f}ms  speedup={scan / index:,.0f}x"
+            )
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Local stub Solana JSON-RPC server for benchmarks and manual testing.
+
+Answers single and batch requests for getTokenAccountsByOwner (jsonParsed or
+base64 amount slice) and
+getTokenSupply, and getProgramAccounts (base64, owner+amount slice) over the
+`holders` wallets. Balances are derived from the owner string so every run is
+reproducible. Every `error_every`-th owner gets a per-item JSON-RPC error,
+and POSTs beyond `max_rps` per second are answered with HTTP 429.
+
+Standalone:
+    python -m bench.stub_rpc --port 8899 --latency-ms 20 --max-rps 20
+"""
+import argparse
+import asyncio
+import base64
+import random
+import time
+import zlib
+
+from aiohttp import web
+
+DECIMALS = 6
+B58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def b58encode(b: bytes) -> str:
+    n = int.from_bytes(b, "big")
+    out = ""
+    while n:
+        n, r = divmod(n, 58)
+        out = B58[r] + out
+    return "1" * (len(b) - len(b.lstrip(b"\0"))) + out
+
+
+def fake_wallets(n: int, seed: int = 0):
+    """n reproducible, well-formed (32-byte) Solana addresses."""
+    rnd = random.Random(seed)
+    return [b58encode(rnd.randbytes(32)) for _ in range(n)]
+
+
+def balance_of(owner: str) -> int:
+    return zlib.crc32(owner.encode()) % (10_000 * 10 ** DECIMALS)
+
+
+def b58decode(s: str) -> bytes:
+    n = 0
+    for c in s:
+        n = n * 58 + B58.index(c)
+    return b"\0" * (len(s) - len(s.lstrip("1"))) + (n.to_bytes((n.bit_length() + 7) // 8, "big") if n else b"")
+
+
+def make_app(latency_ms: float = 0, error_every: int = 0, max_rps: float = 0, holders=()) -> web.Application:
+    stats = {"posts": 0, "calls": 0, "throttled": 0}
+    window = []  # POST timestamps in the last second
+
+    def answer(req: dict) -> dict:
+        stats["calls"] += 1
+        rid, method, params = req.get("id"), req.get("method"), req.get("params") or []
+        if method == "getTokenSupply":
+            value = {"amount": "1000000000000000", "decimals": DECIMALS, "uiAmount": 1e9}
+            return {"jsonrpc": "2.0", "id": rid, "result": {"context": {"slot": 1}, "value": value}}
+        if method == "getProgramAccounts":
+            accounts = []
+            for owner in holders:
+                amount = balance_of(owner)
+                for i, part in enumerate((amount // 2, amount - amount // 2)):
+                    data = b58decode(owner) + part.to_bytes(8, "little")
+                    accounts.append({
+                        "pubkey": f"acct{i}",
+                        "account": {"data": [base64.b64encode(data).decode(), "base64"], "lamports": 2039280},
+                    })
+            return {"jsonrpc": "2.0", "id": rid, "result": accounts}
+        if method == "getTokenAccountsByOwner":
+            owner = params[0]
+            if error_every and zlib.crc32(owner.encode()) % error_every == 0:
+                return {"jsonrpc": "2.0", "id": rid, "error": {"code": -32000, "message": "stub failure"}}
+            amount = balance_of(owner)
+            encoding = (params[2] if len(params) > 2 else {}).get("encoding")
+            # split across two token accounts, like a wallet with a stray ATA
+            accounts = []
+            for i, part in enumerate((amount // 2, amount - amount // 2)):
+                if encoding == "base64":  # assumes dataSlice = the 8-byte amount
+                    data = [base64.b64encode(part.to_bytes(8, "little")).decode(), "base64"]
+                else:
+                    data = {"parsed": {"info": {"tokenAmount": {"amount": str(part), "decimals": DECIMALS}}}}
+                accounts.append({"pubkey": f"acct{i}", "account": {"data": data}})
+            return {"jsonrpc": "2.0", "id": rid, "result": {"context": {"slot": 1}, "value": accounts}}
+        return {"jsonrpc": "2.0", "id": rid, "error": {"code": -32601, "message": "method not found"}}
+
+    async def handle(request: web.Request) -> web.Response:
+        stats["posts"] += 1
+        if max_rps:
+            now = time.monotonic()
+            window[:] = [t for t in window if now - t < 1.0]
+            if len(window) >= max_rps:
+                stats["throttled"] += 1
+                return web.json_response({"error": "rate limited"}, status=429)
+            window.append(now)
+        body = await request.json()
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        if isinstance(body, list):
+            return web.json_response([answer(r) for r in body])
+        return web.json_response(answer(body))
+
+    app = web.Application()
+    app["stats"] = stats
+    app.router.add_post("/", handle)
+    return app
+
+
+async def start_stub(port: int = 0, **kwargs):
+    """Start the stub on localhost; returns (runner, url, stats)."""
+    app = make_app(**kwargs)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/", app["stats"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8899)
+    ap.add_argument("--latency-ms", type=float, default=0)
+    ap.add_argument("--error-every", type=int, default=0)
+    ap.add_argument("--max-rps", type=float, default=0)
+    args = ap.parse_args()
+    app = make_app(args.latency_ms, args.error_every, args.max_rps)
+    web.run_app(app, host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Sweep balance fetching against the local stub RPC: one request per wallet
+(the old sweep, without its 0.25s sleep) vs JSON-RPC batches.
+
+Run from the repo root:
+    python -m bench.sweep_batch [--wallets 2000] [--batch-size 50] [--latency-ms 20]
+
+Also checks that batch results match the single-call results, including the
+per-item errors the stub injects.
+"""
+import argparse
+import asyncio
+import time
+
+from app.solana import SolanaClient
+
+from .stub_rpc import balance_of, fake_wallets, start_stub
+
+MINT = "7VskDPVqgyf5VLtAVw23renwvepm4zScHeuHHw2dpump"
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--wallets", type=int, default=2000)
+    ap.add_argument("--batch-size", type=int, default=50)
+    ap.add_argument("--latency-ms", type=float, default=20)
+    ap.add_argument("--error-every", type=int, default=97)
+    args = ap.parse_args()
+
+    runner, url, stats = await start_stub(latency_ms=args.latency_ms, error_every=args.error_every)
+    rpc = SolanaClient(url)
+    await rpc.start()
+    wallets = fake_wallets(args.wallets)
+
+    try:
+        t = time.perf_counter()
+        single = {}
+        for w in wallets:
+            try:
+                single[w] = await rpc.get_token_balance_raw(w, MINT)
+            except Exception as e:
+                single[w] = e
+        single_s = time.perf_counter() - t
+        single_posts = stats["posts"]
+
+        t = time.perf_counter()
+        batched = {}
+        for i in range(0, len(wallets), args.batch_size):
+            batched.update(await rpc.get_token_balances_raw(wallets[i:i + args.batch_size], MINT))
+        batch_s = time.perf_counter() - t
+        batch_posts = stats["posts"] - single_posts
+
+        errors = 0
+        for w in wallets:
+            a, b = single[w], batched[w]
+            if isinstance(a, Exception):
+                assert isinstance(b, Exception), w
+                errors += 1
+            else:
+                assert a == b == balance_of(w), w
+
+        print(f"wallets={len(wallets)} per-item errors={errors} (matched)")
+        print(f"single  posts={single_posts:>5}  {single_s:7.2f}s  {len(wallets) / single_s:8.0f} wallets/s")
+        print(f"batched posts={batch_posts:>5}  {batch_s:7.2f}s  {len(wallets) / batch_s:8.0f} wallets/s")
+    finally:
+        await rpc.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+Adaptive sweep rate limit against the local stub RPC (app.sweep.fetch_balances).
+
+Three runs:
+  throttled  the stub answers HTTP 429 above --stub-rps; the limiter (starting
+             at --max-rps) must back off below it and every wallet must still
+             be checked, rate-limited batches being re-queued
+  recovered  the same limiter against an unthrottled stub must climb back to
+             --max-rps once the cooldown has passed
+  failure    on_batch raises on the first batch: the other workers must be
+             cancelled, so no requests are sent after fetch_balances raises
+
+Run from the repo root:
+    python -m bench.sweep_limiter [--wallets 1200] [--max-rps 40] [--stub-rps 10]
+"""
+import argparse
+import asyncio
+import time
+
+from app.ratelimit import AdaptiveRateLimiter
+from app.solana import SolanaClient
+from app.sweep import SweepStats, fetch_balances
+
+from .harness import MINT, bench_config
+from .stub_rpc import fake_wallets, start_stub
+
+
+async def sample_rate(limiter: AdaptiveRateLimiter, out: list, every: float = 0.05):
+    while True:
+        out.append(limiter.rate)
+        await asyncio.sleep(every)
+
+
+async def run(rpc, cfg, limiter, wallets, on_batch=None) -> dict:
+    rates = []
+    sampler = asyncio.create_task(sample_rate(limiter, rates))
+    stats = SweepStats()
+    checked = {}
+
+    async def store(balances):
+        checked.update(balances)
+
+    t = time.perf_counter()
+    try:
+        await fetch_balances(rpc, cfg, limiter, MINT, wallets, on_batch or store, stats)
+    finally:
+        sampler.cancel()
+    rates.append(limiter.rate)
+    return {"stats": stats, "rates": rates, "checked": checked, "elapsed": time.perf_counter() - t}
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--wallets", type=int, default=1200)
+    ap.add_argument("--batch-size", type=int, default=20)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--max-rps", type=float, default=40)
+    ap.add_argument("--stub-rps", type=float, default=10)
+    ap.add_argument("--cooldown", type=float, default=1.0)
+    args = ap.parse_args()
+
+    cfg = bench_config(rpc_batch_size=args.batch_size, sweep_concurrency=args.concurrency)
+    limiter = AdaptiveRateLimiter(args.max_rps, cooldown=args.cooldown)
+    wallets = fake_wallets(args.wallets)
+    throttled_runner, throttled_url, throttled = await start_stub(max_rps=args.stub_rps)
+    open_runner, open_url, opened = await start_stub()
+    rpc = SolanaClient(throttled_url)
+    await rpc.start()
+    try:
+        r = await run(rpc, cfg, limiter, wallets)
+        low = min(r["rates"])
+        print(
+            f"throttled: {r['stats'].summary()} 429s={throttled['throttled']} "
+            f"rate {args.max_rps:g} -> min {low:.2f} rps"
+        )
+        assert throttled["throttled"] > 0, "the stub never throttled; raise --max-rps or lower --stub-rps"
+        assert low <= args.stub_rps, "limiter did not back off below the stub's limit"
+        assert len(r["checked"]) == len(wallets), "rate-limited wallets were dropped"
+
+        rpc.rpc_url = open_url
+        r = await run(rpc, cfg, limiter, wallets * 3)
+        print(f"recovered: {r['stats'].summary()} rate {low:.2f} -> {r['rates'][-1]:.2f} rps")
+        assert r["rates"][-1] == args.max_rps, "limiter did not climb back to max_rps"
+
+        async def broken(balances):
+            raise RuntimeError("store failed")
+
+        before = opened["posts"]
+        try:
+            await run(rpc, cfg, AdaptiveRateLimiter(args.max_rps), wallets, broken)
+        except RuntimeError:
+            pass
+        sent = opened["posts"] - before
+        await asyncio.sleep(0.3)
+        late = opened["posts"] - before - sent
+        print(f"failure  : {sent} requests until the error, {late} after it")
+        assert late == 0, "workers kept fetching after the first failure"
+    finally:
+        await rpc.close()
+        await throttled_runner.cleanup()
+        await open_runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+Synthetic Telegram updates (raw Bot API JSON) for the benchmarks: a mix of
+meme posts, replies to earlier memes, like reactions and plain chatter in the
+contest group, reproducible from the seed.
+"""
+import random
+import time
+
+LIKES = ("👍", "❤️", "🔥")
+# share of each update kind, in order: meme post, reply, reaction, chatter
+DEFAULT_MIX = (0.25, 0.35, 0.3, 0.1)
+
+
+def _user(uid: int) -> dict:
+    return {"id": uid, "is_bot": False, "first_name": f"user{uid}", "username": f"user{uid}"}
+
+
+def _chat(chat_id: int) -> dict:
+    if chat_id > 0:
+        return {"id": chat_id, "type": "private", "first_name": f"user{chat_id}"}
+    return {"id": chat_id, "type": "supergroup", "title": f"group{chat_id}"}
+
+
+def message(update_id: int, chat_id: int, uid: int, **fields) -> dict:
+    msg = {"message_id": update_id, "date": int(time.time()), "chat": _chat(chat_id), "from": _user(uid)}
+    msg.update(fields)
+    return {"update_id": update_id, "message": msg}
+
+
+def meme_post(update_id: int, chat_id: int, uid: int) -> dict:
+    photo = [{"file_id": f"f{update_id}", "file_unique_id": f"u{update_id}", "width": 512, "height": 512}]
+    return message(update_id, chat_id, uid, photo=photo)
+
+
+def reply(update_id: int, chat_id: int, uid: int, parent_id: int) -> dict:
+    parent = {"message_id": parent_id, "date": int(time.time()), "chat": _chat(chat_id), "from": _user(1)}
+    return message(update_id, chat_id, uid, text="lol", reply_to_message=parent)
+
+
+def chatter(update_id: int, chat_id: int, uid: int) -> dict:
+    return message(update_id, chat_id, uid, text="gm")
+
+
+def reaction(update_id: int, chat_id: int, uid: int, message_id: int, emoji: str) -> dict:
+    return {"update_id": update_id, "message_reaction": {
+        "chat": _chat(chat_id), "message_id": message_id, "user": _user(uid), "date": int(time.time()),
+        "old_reaction": [], "new_reaction": [{"type": "emoji", "emoji": emoji}],
+    }}
+
+
+def synthetic_updates(n: int, group_id: int, users: int, seed: int = 0, mix=DEFAULT_MIX):
+    """n update dicts from user ids 1..users; kinds drawn with weights mix."""
+    rnd = random.Random(seed)
+    memes = []
+    out = []
+    for i in range(1, n + 1):
+        uid = rnd.randint(1, users)
+        kind = rnd.choices(("meme", "reply", "reaction", "chatter"), weights=mix)[0]
+        if kind in ("reply", "reaction") and not memes:
+            kind = "meme"
+
+        if kind == "meme":
+            out.append(meme_post(i, group_id, uid))
+            memes.append(i)
+        elif kind == "reply":
+            out.append(reply(i, group_id, uid, rnd.choice(memes)))
+        elif kind == "reaction":
+            out.append(reaction(i, group_id, uid, rnd.choice(memes), rnd.choice(LIKES)))
+        else:
+            out.append(chatter(i, group_id, uid))
+    return out
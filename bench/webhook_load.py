@@ -0,0 +1,101 @@
+"""
+Webhook load generator: POSTs synthetic contest-group updates (bench.updates)
+with `--concurrency` connections and reports accepted and processed updates/s
+plus request latency percentiles.
+
+Without --url it starts the real dispatcher in-process (bench.harness) behind
+WebhookServer on a local port, so processed throughput includes scoring and
+sqlite. With --url it only measures the remote endpoint's acknowledgements.
+
+Run from the repo root:
+    python -m bench.webhook_load [--updates 5000] [--concurrency 50] [--max-concurrency 100]
+    python -m bench.webhook_load --url http://127.0.0.1:8080/telegram --secret s3cret
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+from aiohttp import web
+
+from app.webhook import SECRET_HEADER, WebhookServer
+
+from .harness import GROUP_ID, contest_bot
+from .updates import synthetic_updates
+
+
+def pct(sorted_vals, p: float) -> float:
+    return sorted_vals[min(len(sorted_vals) - 1, int(len(sorted_vals) * p))]
+
+
+async def post_all(url: str, secret: str, updates, concurrency: int):
+    queue = iter(updates)
+    latencies = []
+    statuses = {}
+    headers = {SECRET_HEADER: secret} if secret else {}
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        async def client():
+            for update in queue:
+                t = time.perf_counter()
+                async with session.post(url, json=update, headers=headers) as resp:
+                    await resp.read()
+                latencies.append(time.perf_counter() - t)
+                statuses[resp.status] = statuses.get(resp.status, 0) + 1
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    return sorted(latencies), statuses
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="")
+    ap.add_argument("--secret", default="bench")
+    ap.add_argument("--updates", type=int, default=5000)
+    ap.add_argument("--users", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--max-concurrency", type=int, default=100, help="in-process WebhookServer limit")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    updates = synthetic_updates(args.updates, GROUP_ID, args.users, seed=args.seed)
+
+    server = runner = db = None
+    url = args.url
+    if not url:
+        _, bot, dp, db = await contest_bot(args.users)
+        server = WebhookServer(bot, dp, "/telegram", args.secret, args.max_concurrency)
+        runner = web.AppRunner(server.app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/telegram"
+
+    try:
+        t = time.perf_counter()
+        latencies, statuses = await post_all(url, args.secret, updates, args.concurrency)
+        accepted_s = time.perf_counter() - t
+        if server is not None:
+            await server.drain(timeout=60)
+            await db.flush()
+        processed_s = time.perf_counter() - t
+
+        print(f"updates={len(updates)} concurrency={args.concurrency} statuses={statuses}")
+        print(f"accepted : {len(updates) / accepted_s:8.0f} updates/s")
+        if server is not None:
+            print(f"processed: {len(updates) / processed_s:8.0f} updates/s (incl. scoring + sqlite flush)")
+        print(
+            f"request latency p50={pct(latencies, 0.5) * 1000:.1f}ms "
+            f"p99={pct(latencies, 0.99) * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms"
+        )
+        if db is not None:
+            top = await db.top_n(3)
+            print("top 3:", [(r["tg_id"], r["points"]) for r in top])
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+            await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,22 +3,69 @@ from dotenv import load_dotenv
 from aiogram import Bot
 
 from app.config import load_config
-from app.db import DB
+from app.contests import Contests
 from app.bot import build_dispatcher
 from app.sweep import sweep_task
+from app.ratelimit import AdaptiveRateLimiter
+from app.solana import SolanaClient
+from app.holders import HolderWatcher
+from app.outbox import Outbox
+from app.webhook import run_webhook
+from app import metrics
 
 async def main():
     load_dotenv()
     cfg = load_config()
 
-    db = DB(cfg.db_path)
-    db.init()
+    contests = Contests(cfg)
+    await contests.init()
+
+    rpc = SolanaClient(
+        cfg.sol_rpc_url,
+        limit_per_host=cfg.rpc_limit_per_host,
+        dns_cache_seconds=cfg.dns_cache_seconds,
+        timeout_seconds=cfg.rpc_timeout_seconds,
+        price_ttl_seconds=cfg.price_ttl_seconds,
+        balance_ttl_seconds=cfg.balance_ttl_seconds,
+        balance_encoding=cfg.rpc_balance_encoding,
+    )
+    await rpc.start()
+
+    metrics_runner = None
+    if cfg.metrics_port:
+        metrics_runner = await metrics.start_server(cfg.metrics_host, cfg.metrics_port)
 
     bot = Bot(cfg.bot_token)
-    dp = build_dispatcher(bot, cfg, db)
+    outbox = Outbox(bot, global_rps=cfg.outbox_global_rps, workers=cfg.outbox_workers)
+    await outbox.start()
+    dp = build_dispatcher(bot, cfg, contests, rpc, outbox)
 
-    asyncio.create_task(sweep_task(bot, cfg, db))
-    await dp.start_polling(bot)
+    # one sweep (and holder watcher) per contest, sharing the sweep rate limit
+    sweep_limiter = AdaptiveRateLimiter(cfg.sweep_max_rps)
+    tasks = []
+    for contest in contests:
+        tasks.append(asyncio.create_task(sweep_task(outbox, cfg, contest, rpc, sweep_limiter)))
+        if cfg.holder_ws_enabled:
+            tasks.append(asyncio.create_task(HolderWatcher(outbox, cfg, contest, rpc).run()))
+    try:
+        if cfg.update_mode == "webhook":
+            await run_webhook(bot, dp, cfg)
+        else:
+            # a webhook left registered by a previous UPDATE_MODE=webhook run
+            # makes every getUpdates call fail; queued updates are kept
+            await bot.delete_webhook(drop_pending_updates=False)
+            await dp.start_polling(bot)
+    finally:
+        # stop them before closing what they use (outbox, rpc, contest databases)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await outbox.close()
+        await bot.session.close()
+        await rpc.close()
+        await contests.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 if __name__ == "__main__":
     asyncio.run(main())